@@ -1,4 +1,6 @@
 from . import atlas
+from . import caches
+from . import mixer
 from . import skeletons
 from . import utils
 from . import attachment_loader
\ No newline at end of file
@@ -0,0 +1,185 @@
+import math
+import weakref
+
+import numpy as np
+import pygame
+
+from .atlas import TextureFilter
+
+# Filters whose samples within a texture level are nearest neighbour
+NEAREST_FILTERS = (
+    TextureFilter.nearest,
+    TextureFilter.mipMapNearestNearest,
+    TextureFilter.mipMapNearestLinear,
+)
+
+def texture_filter(value):
+    # Atlas pages keep the filter names as written in the .atlas file
+    if isinstance(value, str):
+        return TextureFilter[value[0].lower() + value[1:]]
+    return TextureFilter(value)
+
+def slot_matrix(skeleton, slot, texture_size):
+    # 2x3 matrix taking texture pixels (u right, v down) to target pixels:
+    # texture -> attachment quad -> attachment transform -> bone -> screen
+    attachment = slot.attachment
+    bone = slot.bone
+    width, height = texture_size
+    sx = attachment.width * attachment.scale_x / width
+    sy = -attachment.height * attachment.scale_y / height
+    tx = -attachment.width * attachment.scale_x / 2
+    ty = attachment.height * attachment.scale_y / 2
+
+    radians = math.radians(attachment.rotation)
+    cos = math.cos(radians)
+    sin = math.sin(radians)
+    # Attachment rotation applied to the scaled quad
+    a00, a01 = cos * sx, -sin * sy
+    a10, a11 = sin * sx, cos * sy
+    a02 = cos * tx - sin * ty + attachment.x
+    a12 = sin * tx + cos * ty + attachment.y
+
+    # Bone matrix, then y flipped from skeleton space (y up) to screen space
+    m00, m01, m10, m11 = bone.m00, bone.m01, bone.m10, bone.m11
+    return (
+        (m00 * a00 + m01 * a10, m00 * a01 + m01 * a11, m00 * a02 + m01 * a12 + bone.world_x + skeleton.x),
+        (-(m10 * a00 + m11 * a10), -(m10 * a01 + m11 * a11), skeleton.y - (m10 * a02 + m11 * a12 + bone.world_y)),
+    )
+
+class AffineRenderer:
+    # Draws every slot straight into the target with one inverse mapped pass,
+    # instead of the rotate, scale and flip chain of Skeleton.draw. Set it as
+    # skeleton.renderer to use it
+    def __init__(self, filter = None):
+        # None picks nearest or bilinear sampling from each atlas page
+        self.filter = filter
+        self._sources = weakref.WeakKeyDictionary()
+
+    def source(self, texture):
+        # Premultiplied float copies of a texture, indexed [u, v]
+        arrays = self._sources.get(texture)
+        if arrays is None:
+            alpha = pygame.surfarray.array_alpha(texture).astype(np.float32) / 255
+            rgb = pygame.surfarray.array3d(texture).astype(np.float32) * alpha[..., None]
+            arrays = self._sources[texture] = (rgb, alpha)
+        return arrays
+
+    def nearest(self, attachment, matrix):
+        if self.filter is not None:
+            return texture_filter(self.filter) in NEAREST_FILTERS
+        page = attachment.region.page
+        # Magnified slots sample with the page's mag filter, others with min
+        (a, b, _), (c, d, _) = matrix
+        magnified = math.fabs(a * d - b * c) > 1
+        value = page.mag_filter if magnified else page.min_filter
+        return texture_filter(value) in NEAREST_FILTERS
+
+    def draw(self, skeleton, surface, dirty = False):
+        counters = skeleton.cull_counters
+        clip = surface.get_clip()
+        rgb = pygame.surfarray.pixels3d(surface)
+        alpha = pygame.surfarray.pixels_alpha(surface) if surface.get_flags() & pygame.SRCALPHA else None
+        level = skeleton.current_lod()
+        min_area = level.min_area / skeleton.lod_scale ** 2 if level is not None else 0
+        rects = []
+        culled = 0
+        try:
+            for slot in skeleton.ordered_drawables:
+                if slot.attachment is None:
+                    continue
+                rect = self.draw_slot(skeleton, slot, rgb, alpha, clip, min_area)
+                if rect is False:
+                    # Below the level of detail, neither culled nor drawn
+                    continue
+                if rect is None:
+                    culled += 1
+                else:
+                    rects.append(rect)
+        finally:
+            del rgb
+            del alpha
+        # Off-screen slots are always skipped, like the blit path they only
+        # count as culled with culling on
+        if skeleton.culling:
+            counters['slots_culled'] += culled
+            if not rects and culled:
+                counters['skeletons_culled'] += 1
+        counters['slots_drawn'] += len(rects)
+        if dirty:
+            return skeleton._dirty_rect(rects)
+
+    def draw_slot(self, skeleton, slot, target_rgb, target_alpha, clip, min_area = 0):
+        # Returns the rect drawn to, None when off-screen or False when the
+        # slot is too small for the level of detail
+        attachment = slot.attachment
+        texture = attachment.texture
+        width, height = texture.get_size()
+        matrix = slot_matrix(skeleton, slot, (width, height))
+        (a, b, c), (d, e, f) = matrix
+        det = a * e - b * d
+        if not det:
+            return None
+        if math.fabs(det) * width * height < min_area:
+            return False
+
+        # Target pixels covered by the transformed texture, within the clip
+        xs = [a * u + b * v + c for u, v in ((0, 0), (width, 0), (0, height), (width, height))]
+        ys = [d * u + e * v + f for u, v in ((0, 0), (width, 0), (0, height), (width, height))]
+        x0 = max(clip.left, math.floor(min(xs)))
+        x1 = min(clip.right, math.ceil(max(xs)))
+        y0 = max(clip.top, math.floor(min(ys)))
+        y1 = min(clip.bottom, math.ceil(max(ys)))
+        if x0 >= x1 or y0 >= y1:
+            return None
+
+        # Inverse map the centre of every target pixel into the texture
+        px = np.arange(x0, x1, dtype=np.float32)[:, None] + 0.5 - c
+        py = np.arange(y0, y1, dtype=np.float32)[None, :] + 0.5 - f
+        u = (e * px - b * py) / det
+        v = (a * py - d * px) / det
+        inside = np.nonzero((u >= 0) & (u < width) & (v >= 0) & (v < height))
+        if not len(inside[0]):
+            return None
+        u = u[inside]
+        v = v[inside]
+
+        source_rgb, source_alpha = self.source(texture)
+        if self.nearest(attachment, matrix):
+            ui = u.astype(np.intp)
+            vi = v.astype(np.intp)
+            color = source_rgb[ui, vi]
+            coverage = source_alpha[ui, vi]
+        else:
+            # Bilinear between texel centres, clamped to the region edges
+            u = u - 0.5
+            v = v - 0.5
+            u_floor = np.floor(u)
+            v_floor = np.floor(v)
+            fu = (u - u_floor)[:, None]
+            fv = (v - v_floor)[:, None]
+            u0 = np.clip(u_floor.astype(np.intp), 0, width - 1)
+            v0 = np.clip(v_floor.astype(np.intp), 0, height - 1)
+            u1 = np.minimum(u0 + 1, width - 1)
+            v1 = np.minimum(v0 + 1, height - 1)
+            weights = ((1 - fu) * (1 - fv), fu * (1 - fv), (1 - fu) * fv, fu * fv)
+            taps = ((u0, v0), (u1, v0), (u0, v1), (u1, v1))
+            color = sum(w * source_rgb[tu, tv] for w, (tu, tv) in zip(weights, taps))
+            coverage = sum(w[:, 0] * source_alpha[tu, tv] for w, (tu, tv) in zip(weights, taps))
+
+        # Premultiplied source over the target
+        region = target_rgb[x0:x1, y0:y1]
+        keep = 1 - coverage
+        if target_alpha is None:
+            rgb = color + region[inside] * keep[:, None]
+        else:
+            # The target keeps straight alpha, blend premultiplied and divide
+            # the result back by its alpha
+            region_alpha = target_alpha[x0:x1, y0:y1]
+            dst_alpha = region_alpha[inside] / np.float32(255)
+            dst_keep = dst_alpha * keep
+            out_alpha = coverage + dst_keep
+            rgb = color + region[inside] * dst_keep[:, None]
+            rgb /= np.maximum(out_alpha, 1e-6)[:, None]
+            region_alpha[inside] = np.clip(out_alpha * 255 + 0.5, 0, 255).astype(np.uint8)
+        region[inside] = np.clip(rgb + 0.5, 0, 255).astype(np.uint8)
+        return pygame.Rect(x0, y0, x1 - x0, y1 - y0)
@@ -7,6 +7,10 @@ class Animation:
         self.name = name
         self.timelines = timelines
         self.duration = duration
+        self.bakes = {}
+        # Split once for mixer.mix_all, which blends bone timelines per bone
+        self.bone_timelines = [t for t in timelines if hasattr(t, 'mix_local')]
+        self.slot_timelines = [t for t in timelines if not hasattr(t, 'mix_local')]
 
     def mix(self, skeleton, time, loop, alpha):
         if loop and self.duration:
@@ -21,6 +25,23 @@ class Animation:
     def apply(self, skeleton, time, loop):
         self.mix(skeleton, time, loop, 1)
 
+    def bake(self, fps = 30, blend = True):
+        key = (fps, blend)
+        if key not in self.bakes:
+            self.bakes[key] = Animation(
+                self.name, 
+                [timeline.bake(fps, blend) for timeline in self.timelines], 
+                self.duration
+            )
+        return self.bakes[key]
+
+    @property
+    def baked_nbytes(self):
+        return sum(
+            timeline.baked.nbytes for timeline in self.timelines 
+                if timeline.baked is not None
+        )
+
     @staticmethod
     def build_bone_timeline(timeline_name, keyframes, bone_index):
         if timeline_name == 'rotate':
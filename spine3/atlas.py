@@ -1,8 +1,10 @@
-from multiprocessing.sharedctypes import Value
 import os
+import weakref
 from pathlib import Path
 from enum import IntEnum
 
+from .indexing import NameIndex
+
 formatNames = (
     'Alpha', 
     'Intensity',
@@ -51,6 +53,7 @@ class Atlas:
     def __init__(self, file : Path):
         self.pages = []
         self.regions = []
+        self._region_index = NameIndex()
         self.file_loc = (Path(file).parent.parent)
         self.loadWithFile(file)
 
@@ -87,7 +90,7 @@ class Atlas:
                     _page[key] = value
                     if key == 'repeat':
                         path = self.file_loc / _page['name']
-                        page = AtlasPage.build_from(_page, path)              
+                        page = AtlasPage.build_from(_page, path)
                         self.pages.append(page)
             else:
                 if not ':' in value:
@@ -105,11 +108,33 @@ class Atlas:
                         self.regions.append(region)
                         _region = {}
 
+    def pages_for(self, skins):
+        return {
+            attachment.region.page 
+                for skin in skins 
+                    for attachment in skin.attachments.values()
+                        if attachment.region.page in self.pages
+        }
+
+    def preload(self, skins):
+        for page in self.pages_for(skins):
+            page.load()
+
+    def unload_unused(self, skins):
+        # skins are every skin still in use, the default one included
+        used = self.pages_for(skins)
+        for page in self.pages:
+            if page not in used:
+                page.unload()
+
+    def findRegionIndex(self, name):
+        i = self._region_index.find(self.regions, name)
+        if i < 0:
+            raise NameError(f"Region {name} does not exist")
+        return i
+
     def findRegion(self, name):
-        for region in self.regions:
-            if region.name == name:
-                return region
-        raise NameError(f"Region {name} does not exist")
+        return self.regions[self.findRegionIndex(name)]
 
 class AtlasRegion:
     def __init__(self, name, x, y, width, height, offset_x, offset_y, og_width, og_height, index, splits, pads, page):
@@ -146,18 +171,44 @@ class AtlasRegion:
         return cls(name, x, y, width, height, offset_x, offset_y, og_width, og_height, index, splits, pads, page)
 
 class AtlasPage:
-    def __init__(self, name, format, min_filter, mag_filter, u_wrap, v_wrap, texture):
+    def __init__(self, name, format, min_filter, mag_filter, u_wrap, v_wrap, texture = None, path = None):
         self.name = name
         self.format = format
         self.min_filter = min_filter
         self.mag_filter = mag_filter
         self.u_wrap = u_wrap
         self.v_wrap = v_wrap
-        self.texture = texture
+        self.path = path
+        self._texture = texture
+        # Attachments currently holding a subsurface of the texture
+        self.attachments = weakref.WeakSet()
+
+    @property
+    def loaded(self):
+        return self._texture is not None
+
+    @property
+    def texture(self):
+        if self._texture is None:
+            self.load()
+        return self._texture
+
+    def load(self):
+        from . import texture_cache
+        if self._texture is None:
+            # Decoded pages are mapped from the texture cache after the first run
+            self._texture = texture_cache.load(self.path.resolve())
+        return self._texture
+
+    def unload(self):
+        if self._texture is None or self.path is None:
+            return
+        for attachment in list(self.attachments):
+            attachment.release()
+        self._texture = None
+
     @classmethod
     def build_from(cls, page, img_path):
-        import pygame
-        texture = pygame.image.load(img_path.resolve()).convert_alpha()
         min_filter, mag_filter = page['filter']
         u_wrap = TextureWrap.clampToEdge
         v_wrap = TextureWrap.clampToEdge
@@ -175,5 +226,5 @@ class AtlasPage:
             mag_filter = mag_filter, 
             u_wrap = u_wrap, 
             v_wrap = v_wrap, 
-            texture = texture
+            path = img_path
         )
@@ -11,9 +11,10 @@ class AttachmentType(Enum):
         return AttachmentType[string]
 
 class AttachmentLoader:
-    def __init__(self, atlas):
+    def __init__(self, atlas, rotation_steps = None):
         super().__init__()
         self.atlas = atlas
+        self.rotation_steps = rotation_steps
 
     def new_from(self, attach_name, attach_map, scale):
         region = self.atlas.findRegion(attach_map.get("name", attach_name))
@@ -32,5 +33,8 @@ class AttachmentLoader:
         attachment.width = float(attach_map.get('width', 32)) * scale
         attachment.height = float(attach_map.get('height', 32)) * scale  
 
+        if self.rotation_steps:
+            attachment.bake_rotations(self.rotation_steps)
+
         return attachment
 
@@ -0,0 +1,180 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from . import atlas
+from . import attachment_loader
+from . import headless
+from . import skeletons
+
+DATA = Path(__file__).parent / 'pygame_examples' / 'data'
+
+# Bundled rigs and the skin each one is drawn with
+RIGS = (
+    ('spineboy', None),
+    ('goblins', 'goblin'),
+    ('dragon', None),
+    ('powerup', None),
+    ('spinosaurus', None),
+)
+
+def measure(calls, run, prepare = None, repeat = 3):
+    # Only run(i) is timed, prepare(i) puts the rig in the state run expects.
+    # Timings are the best of repeat passes, allocations come from one extra
+    # pass under tracemalloc so that tracing does not skew the timings
+    best = float('inf')
+    for _ in range(repeat):
+        total = 0.0
+        for i in range(calls):
+            if prepare is not None:
+                prepare(i)
+            start = time.perf_counter()
+            run(i)
+            total += time.perf_counter() - start
+        best = min(best, total)
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for i in range(calls):
+        if prepare is not None:
+            prepare(i)
+        run(i)
+    after, peak = tracemalloc.get_traced_memory()
+    if not tracing:
+        tracemalloc.stop()
+
+    seconds = best / calls
+    return {
+        'seconds': seconds,
+        'fps': 1 / seconds if seconds else float('inf'),
+        'alloc_peak_bytes': max(0, peak - before),
+        'alloc_retained_bytes': max(0, after - before),
+    }
+
+def bench_rig(name, skin = None, frames = 60, fps = 60, repeat = 3, data = DATA):
+    results = {}
+    atlas_path = Path(data) / (name + '.atlas')
+    skeleton_text = (Path(data) / (name + '.json')).read_text()
+
+    results['%s.atlas_parse' % name] = measure(
+        1, lambda i: atlas.Atlas(file = atlas_path), repeat = repeat
+    )
+    loader = attachment_loader.AttachmentLoader(atlas.Atlas(file = atlas_path))
+    results['%s.skeleton_parse' % name] = measure(
+        1, lambda i: skeletons.Skeleton.parse(skeleton_text, loader), repeat = repeat
+    )
+
+    skeleton = skeletons.Skeleton.parse(skeleton_text, loader)
+    if skin:
+        skeleton.set_skin(skin)
+    skeleton.set_to_bind_pose()
+    skeleton.x, skeleton.y = 512, 600
+    target = headless.new_target((1024, 1024))
+
+    def pose(animation):
+        def prepare(i):
+            animation.mix(skeleton, i / fps, True, 1)
+        return prepare
+
+    for animation in skeleton.data.animations:
+        results['%s.mix.%s' % (name, animation.name)] = measure(
+            frames, pose(animation), repeat = repeat
+        )
+
+    # Per frame costs of a moving skeleton, with the first animation driving it
+    animation = skeleton.data.animations[0]
+    results['%s.update_world_transform' % name] = measure(
+        frames, lambda i: skeleton.update_world_transform(), pose(animation), repeat
+    )
+
+    def prepare_draw(i):
+        pose(animation)(i)
+        skeleton.update_world_transform()
+    results['%s.draw' % name] = measure(
+        frames, lambda i: skeleton.draw(target), prepare_draw, repeat
+    )
+    return results
+
+def run(rigs = RIGS, frames = 60, repeat = 3, data = DATA):
+    results = {}
+    for name, skin in rigs:
+        results.update(bench_rig(name, skin, frames, repeat = repeat, data = data))
+    return {
+        'python': sys.version,
+        'platform': platform.platform(),
+        'frames': frames,
+        'results': results,
+    }
+
+def save(report, path):
+    Path(path).write_text(json.dumps(report, indent=1, sort_keys=True))
+
+def load(path):
+    return json.loads(Path(path).read_text())
+
+def compare(baseline, report, threshold = 0.10):
+    # Returns (name, baseline seconds, seconds, ratio, regressed) per benchmark
+    # found in both reports, regressed when it got slower by more than threshold
+    rows = []
+    for name, result in sorted(report['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = result['seconds'] / base['seconds'] if base['seconds'] else 1.0
+        rows.append((name, base['seconds'], result['seconds'], ratio, ratio > 1 + threshold))
+    return rows
+
+def format_report(report):
+    lines = ['%-40s %12s %10s %12s %12s' % ('benchmark', 'ms', 'fps', 'peak KiB', 'kept KiB')]
+    for name, result in sorted(report['results'].items()):
+        lines.append('%-40s %12.3f %10.0f %12.1f %12.1f' % (
+            name,
+            result['seconds'] * 1000,
+            result['fps'],
+            result['alloc_peak_bytes'] / 1024,
+            result['alloc_retained_bytes'] / 1024
+        ))
+    return '\n'.join(lines)
+
+def format_comparison(rows):
+    lines = ['%-40s %12s %12s %8s' % ('benchmark', 'base ms', 'ms', 'ratio')]
+    for name, base, seconds, ratio, regressed in rows:
+        lines.append('%-40s %12.3f %12.3f %8.2f%s' % (
+            name, base * 1000, seconds * 1000, ratio, '  REGRESSION' if regressed else ''
+        ))
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Benchmark spine3 over the bundled example rigs')
+    parser.add_argument('--rigs', nargs = '*', default = None)
+    parser.add_argument('--frames', type = int, default = 60)
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--save', default = None, help = 'write the results as a JSON baseline')
+    parser.add_argument('--compare', default = None, help = 'JSON baseline to check for regressions')
+    parser.add_argument('--threshold', type = float, default = 0.10)
+    args = parser.parse_args()
+
+    rigs = RIGS
+    if args.rigs:
+        skins = dict(RIGS)
+        rigs = [(name, skins.get(name)) for name in args.rigs]
+    report = run(rigs, args.frames, args.repeat)
+    print(format_report(report))
+    if args.save:
+        save(report, args.save)
+    if args.compare:
+        rows = compare(load(args.compare), report, args.threshold)
+        print()
+        print(format_comparison(rows))
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
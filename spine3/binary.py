@@ -0,0 +1,366 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+from . import animation
+from . import bone
+from . import skin
+from . import slots
+from . import timelines
+from .utils import Color
+
+MAGIC = b'SPN3'
+VERSION = 1
+SUFFIX = '.skel3'
+NONE = 0xFFFFFFFF
+
+HEADER = struct.Struct('<4sHHqq')
+COUNT = struct.Struct('<I')
+BONE = struct.Struct('<Ii6d')
+SLOT = struct.Struct('<II4BI')
+SKIN = struct.Struct('<II')
+ATTACHMENT = struct.Struct('<IIII7d')
+ANIMATION = struct.Struct('<II')
+TIMELINE = struct.Struct('<BII')
+
+BONE_TIMELINES = ('rotate', 'translate', 'scale')
+SLOT_TIMELINES = ('color', 'attachment')
+TIMELINE_KINDS = BONE_TIMELINES + SLOT_TIMELINES
+
+class StaleError(Exception): pass
+
+# Raised reading a truncated or damaged file, load_or_parse then falls back to
+# the JSON like it does for stale files
+READ_ERRORS = (StaleError, ValueError, TypeError, IndexError, KeyError, struct.error, OSError)
+
+class _Strings:
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def __call__(self, string):
+        if string is None:
+            return NONE
+        if string not in self.index:
+            self.index[string] = len(self.strings)
+            self.strings.append(string)
+        return self.index[string]
+
+    def pack(self):
+        out = bytearray(COUNT.pack(len(self.strings)))
+        for string in self.strings:
+            encoded = string.encode('utf-8')
+            out += struct.pack('<H', len(encoded)) + encoded
+        return bytes(out)
+
+def _source_stamp(path):
+    stat = Path(path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+def _array_bytes(values):
+    # Keyframe arrays are stored little endian like the struct records
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _pack_keyframes(kind, keyframes):
+    keyframes = sorted(keyframes, key=lambda x: x['time'])
+    times = array('d', (float(keyframe['time']) for keyframe in keyframes))
+    curve_kinds = array('B')
+    points = array('d')
+    for keyframe in keyframes:
+        curve = keyframe.get('curve', 'linear')
+        if curve == 'linear':
+            curve_kinds.append(timelines.CurveTable.LINEAR)
+            points.extend((0.0, 0.0, 0.0, 0.0))
+        elif curve == 'stepped':
+            curve_kinds.append(timelines.CurveTable.STEPPED)
+            points.extend((0.0, 0.0, 0.0, 0.0))
+        else:
+            curve_kinds.append(timelines.CurveTable.BEZIER)
+            points.extend(float(x) for x in curve)
+    # The sampled curve tables are stored too so loading never evaluates a curve
+    curves = timelines.CurveTable()
+    curve_rows = array('I', (
+        curves.add(_curve(kind_i, points, i)) 
+            for (i, kind_i) in enumerate(curve_kinds)
+    ))
+    if kind == 'rotate':
+        values = array('d', (float(keyframe['angle']) for keyframe in keyframes))
+    elif kind in ('translate', 'scale'):
+        values = array('d', (float(c) for keyframe in keyframes for c in (keyframe['x'], keyframe['y'])))
+    elif kind == 'color':
+        values = array('B', (int(keyframe['color'][i:i + 2], 16) for keyframe in keyframes for i in (0, 2, 4, 6)))
+    else:
+        values = None
+    return times, curve_kinds, points, curves, curve_rows, values, keyframes
+
+def compile_root(root : dict, source_stamp = (0, 0)):
+    strings = _Strings()
+    bone_index = {}
+    body = bytearray()
+
+    bones = root.get('bones', [])
+    body += COUNT.pack(len(bones))
+    for i, bone_map in enumerate(bones):
+        bone_index[bone_map['name']] = i
+        parent = bone_index[bone_map['parent']] if 'parent' in bone_map else -1
+        body += BONE.pack(
+            strings(bone_map['name']),
+            parent,
+            float(bone_map.get('length', 0.0)),
+            float(bone_map.get('x', 0.0)),
+            float(bone_map.get('y', 0.0)),
+            float(bone_map.get('rotation', 0.0)),
+            float(bone_map.get('scaleX', 1.0)),
+            float(bone_map.get('scaleY', 1.0))
+        )
+
+    slot_index = {}
+    slots_list = root.get('slots', [])
+    body += COUNT.pack(len(slots_list))
+    for i, slot_map in enumerate(slots_list):
+        slot_index[slot_map['name']] = i
+        color = Color.parse(slot_map.get('color', "ff" * 4))
+        body += SLOT.pack(
+            strings(slot_map['name']),
+            bone_index[slot_map['bone']],
+            color.r, color.g, color.b, color.a,
+            strings(slot_map.get('attachment', None))
+        )
+
+    skins = root.get('skins', {})
+    body += COUNT.pack(len(skins))
+    for (skin_name, slot_map) in skins.items():
+        attachments = [
+            (slot_name, attach_name, attach_map)
+                for (slot_name, attachments_map) in slot_map.items()
+                    for (attach_name, attach_map) in attachments_map.items()
+        ]
+        body += SKIN.pack(strings(skin_name), len(attachments))
+        for (slot_name, attach_name, attach_map) in attachments:
+            body += ATTACHMENT.pack(
+                slot_index[slot_name],
+                strings(attach_name),
+                strings(attach_map.get('name', attach_name)),
+                strings(attach_map.get('type', 'region')),
+                float(attach_map.get('x', 0.0)),
+                float(attach_map.get('y', 0.0)),
+                float(attach_map.get('scaleX', 1.0)),
+                float(attach_map.get('scaleY', 1.0)),
+                float(attach_map.get('rotation', 0.0)),
+                float(attach_map.get('width', 32)),
+                float(attach_map.get('height', 32))
+            )
+
+    animations = root.get('animations', {})
+    body += COUNT.pack(len(animations))
+    for (animation_name, animation_map) in animations.items():
+        timelines_list = []
+        for (group, index, kinds) in (('bones', bone_index, BONE_TIMELINES), ('slots', slot_index, SLOT_TIMELINES)):
+            for (target_name, timeline_map) in animation_map.get(group, {}).items():
+                for (timeline_name, keyframes) in timeline_map.items():
+                    if timeline_name not in kinds:
+                        raise ValueError("Timeline %s is not supported" % timeline_name)
+                    timelines_list.append((TIMELINE_KINDS.index(timeline_name), index[target_name], keyframes))
+        body += ANIMATION.pack(strings(animation_name), len(timelines_list))
+        for (kind, target, keyframes) in timelines_list:
+            times, curve_kinds, points, curves, curve_rows, values, keyframes = _pack_keyframes(TIMELINE_KINDS[kind], keyframes)
+            body += TIMELINE.pack(kind, target, len(times))
+            body += _array_bytes(times) + _array_bytes(curve_kinds) + _array_bytes(points)
+            body += COUNT.pack(len(curves)) + _array_bytes(curves.kinds) + _array_bytes(curves.values)
+            body += _array_bytes(curve_rows)
+            if values is None:
+                values = array('I', (strings(keyframe.get('name')) for keyframe in keyframes))
+            body += _array_bytes(values)
+
+    return HEADER.pack(MAGIC, VERSION, timelines.CurveTable.SAMPLES, *source_stamp) + strings.pack() + bytes(body)
+
+def compile_file(json_path, out_path = None):
+    json_path = Path(json_path)
+    out_path = Path(out_path) if out_path else json_path.with_suffix(SUFFIX)
+    with json_path.open('r') as fh:
+        root = json.load(fh)
+    _write(out_path, compile_root(root, _source_stamp(json_path)))
+    return out_path
+
+def _write(path, data):
+    # Written aside and renamed, a concurrent reader never sees a torn file
+    fd, temp = tempfile.mkstemp(dir = path.parent, suffix = '.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+class _Reader:
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        self.offset = 0
+
+    def unpack(self, fmt : struct.Struct):
+        values = fmt.unpack_from(self.buffer, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def count(self):
+        return self.unpack(COUNT)[0]
+
+    def array(self, typecode, length):
+        end = self.offset + struct.calcsize(typecode) * length
+        chunk = self.buffer[self.offset:end]
+        self.offset = end
+        if sys.byteorder == 'little':
+            # Zero copy view over the file contents
+            return chunk.cast(typecode)
+        values = array(typecode, chunk.tobytes())
+        values.byteswap()
+        return values
+
+    def strings(self):
+        to_r = []
+        for _ in range(self.count()):
+            (length, ) = struct.unpack_from('<H', self.buffer, self.offset)
+            self.offset += 2
+            to_r.append(bytes(self.buffer[self.offset:self.offset + length]).decode('utf-8'))
+            self.offset += length
+        return to_r
+
+def _curve(kind, points, i):
+    if kind == timelines.CurveTable.LINEAR:
+        return timelines.LINEAR
+    elif kind == timelines.CurveTable.STEPPED:
+        return timelines.STEPPED
+    return timelines.BezierCurveData.from_points(*points[4 * i:4 * i + 4])
+
+def _read_timeline(reader, strings, kind, target, length):
+    times = reader.array('d', length)
+    curve_kinds = reader.array('B', length)
+    points = reader.array('d', 4 * length)
+    rows = reader.count()
+    curves = timelines.CurveTable.from_arrays(
+        reader.array('B', rows), 
+        reader.array('d', rows * (timelines.CurveTable.SAMPLES + 1))
+    )
+    curve_rows = reader.array('I', length)
+    name = TIMELINE_KINDS[kind]
+    Keyframe = timelines.InterpolableKeyframe
+    if name == 'rotate':
+        timeline = timelines.RotateTimeline(target)
+        values = [Keyframe.BoundedAngularScalar(angle) for angle in reader.array('d', length)]
+    elif name in ('translate', 'scale'):
+        timeline = timelines.TranslateTimeline(target) if name == 'translate' else timelines.ScaleTimeline(target)
+        raw = reader.array('d', 2 * length)
+        values = [Keyframe.ScalarCouple(raw[2 * i:2 * i + 2]) for i in range(length)]
+    elif name == 'color':
+        timeline = timelines.ColorTimeline(target)
+        raw = reader.array('B', 4 * length)
+        values = [Keyframe.ValueList(Color(*raw[4 * i:4 * i + 4])) for i in range(length)]
+    else:
+        timeline = timelines.AttachmentTimeline(target)
+        values = [
+            Keyframe.ValueList(None if i == NONE else strings[i])
+                for i in reader.array('I', length)
+        ]
+    timeline.keyframes = [
+        Keyframe(times[i], _curve(curve_kinds[i], points, i), values[i])
+            for i in range(length)
+    ]
+    timeline.curves = curves
+    timeline.curve_rows = curve_rows
+    return timeline
+
+def load_bytes(buffer, attachment_loader, scale = 1, source_stamp = None):
+    from .skeletons import SkeletonData
+    reader = _Reader(buffer)
+    magic, version, samples, *stamp = reader.unpack(HEADER)
+    if magic != MAGIC:
+        raise ValueError("Not a compiled spine3 skeleton")
+    if version != VERSION:
+        raise StaleError("Compiled with format version %d, expected %d" % (version, VERSION))
+    if samples != timelines.CurveTable.SAMPLES:
+        raise StaleError("Compiled with %d curve samples, expected %d" % (samples, timelines.CurveTable.SAMPLES))
+    if source_stamp is not None and tuple(stamp) != tuple(source_stamp):
+        raise StaleError("Compiled file is older than its source")
+    strings = reader.strings()
+    def string(i): return None if i == NONE else strings[i]
+
+    skeleton_data = SkeletonData()
+    for _ in range(reader.count()):
+        name, parent, length, x, y, rotation, scale_x, scale_y = reader.unpack(BONE)
+        bone_data = bone.BoneData(strings[name])
+        if parent >= 0:
+            bone_data.parent = skeleton_data.bones[parent]
+        bone_data.length = length * scale
+        bone_data.x = x * scale
+        bone_data.y = y * scale
+        bone_data.rotation = rotation
+        bone_data.scale_x = scale_x
+        bone_data.scale_y = scale_y
+        skeleton_data.bones.append(bone_data)
+
+    for _ in range(reader.count()):
+        name, bone_i, r, g, b, a, attachment_name = reader.unpack(SLOT)
+        skeleton_data.slots.append(slots.SlotData(
+            name = strings[name],
+            bone_data = skeleton_data.bones[bone_i],
+            color = Color(r, g, b, a),
+            attachment_name = string(attachment_name)
+        ))
+
+    for _ in range(reader.count()):
+        name, attachment_count = reader.unpack(SKIN)
+        skin_spec = skin.Skin(strings[name])
+        for _ in range(attachment_count):
+            slot_i, attach_name, region_name, type_name, x, y, scale_x, scale_y, rotation, width, height = reader.unpack(ATTACHMENT)
+            attach_map = {
+                'name': strings[region_name], 'type': strings[type_name],
+                'x': x, 'y': y, 'scaleX': scale_x, 'scaleY': scale_y,
+                'rotation': rotation, 'width': width, 'height': height
+            }
+            attachment = attachment_loader.new_from(strings[attach_name], attach_map, scale)
+            skin_spec.add_attachment(slot_i, strings[attach_name], attachment)
+        if skin_spec.name == 'default':
+            skeleton_data.default_skin = skin_spec
+        skeleton_data.skins.append(skin_spec)
+
+    for _ in range(reader.count()):
+        name, timeline_count = reader.unpack(ANIMATION)
+        timelines_lst = [
+            _read_timeline(reader, strings, *reader.unpack(TIMELINE))
+                for _ in range(timeline_count)
+        ]
+        duration = max(tl.duration for tl in timelines_lst)
+        skeleton_data.animations.append(animation.Animation(strings[name], timelines_lst, duration))
+
+    return skeleton_data
+
+def load(path, attachment_loader, scale = 1, source_path = None):
+    stamp = _source_stamp(source_path) if source_path else None
+    return load_bytes(Path(path).read_bytes(), attachment_loader, scale, stamp)
+
+def load_or_parse(json_path, attachment_loader, scale = 1, compiled_path = None, write = True):
+    from .skeletons import SkeletonData
+    json_path = Path(json_path)
+    compiled_path = Path(compiled_path) if compiled_path else json_path.with_suffix(SUFFIX)
+    if compiled_path.exists():
+        try:
+            return load(compiled_path, attachment_loader, scale, source_path = json_path)
+        except READ_ERRORS:
+            pass
+    with json_path.open('r') as fh:
+        root = json.load(fh)
+    if write:
+        try:
+            _write(compiled_path, compile_root(root, _source_stamp(json_path)))
+        except OSError:
+            # A read only directory only costs the parse
+            pass
+    return SkeletonData.build_from(root, attachment_loader, scale)
@@ -31,6 +31,11 @@ class Bone:
     def __init__(self, data):
         self.data = data
         self.parent = None
+        # Local transform the world transform was last computed from, see
+        # Skeleton.update_world_transform
+        self.applied = None
+        # Skeleton.world_version at which the world transform last changed
+        self.changed_at = 0
         self.x = data.x
         self.y = data.y
         self.rotation = data.rotation
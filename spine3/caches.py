@@ -0,0 +1,182 @@
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+DEFAULT_TRANSFORM_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_POSE_CACHE_BYTES = 16 * 1024 * 1024
+
+class LRUCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # Poses may be evaluated from several threads, see scene.update_all
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                # Would evict everything else and itself, not worth keeping
+                return value
+            self._entries[key] = (value, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.size -= evicted_bytes
+                self.evictions += 1
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def discard_if(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self.size -= self._entries.pop(key)[1]
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+class TransformCache(LRUCache):
+    def __init__(self, max_bytes = DEFAULT_TRANSFORM_CACHE_BYTES, scale_accuracy = 64):
+        super().__init__(max_bytes)
+        self.scale_accuracy = scale_accuracy
+        _transform_caches.add(self)
+
+    @staticmethod
+    def quantize(value, accuracy):
+        return round(value * accuracy) / accuracy
+
+    @staticmethod
+    def surface_bytes(surface):
+        width, height = surface.get_size()
+        return width * height * surface.get_bytesize()
+
+    def transform(self, texture, angle, scale_x, scale_y, rotation_accuracy = 1):
+        import pygame
+        # Angles are bucketed to 1 / rotation_accuracy degrees and scales to
+        # 1 / scale_accuracy, so that nearby poses share the same entry
+        angle = self.quantize(angle, rotation_accuracy) % 360
+        scale_x = self.quantize(scale_x, self.scale_accuracy)
+        scale_y = self.quantize(scale_y, self.scale_accuracy)
+        key = (texture, angle, scale_x, scale_y)
+        result = self.get(key)
+        if result is None:
+            result = texture
+            if angle:
+                result = pygame.transform.rotate(result, -angle)
+            width, height = result.get_size()
+            result = pygame.transform.scale(
+                result,
+                (int(width * scale_x), int(height * scale_y))
+            )
+            self.put(key, result, self.surface_bytes(result))
+        return result
+
+    def forget(self, texture):
+        self.discard_if(lambda key: key[0] is texture)
+
+BONE_FIELDS = (
+    'x', 'y', 'rotation', 'scale_x', 'scale_y',
+    'world_x', 'world_y', 'world_rotation', 'world_scale_x', 'world_scale_y',
+    'm00', 'm01', 'm10', 'm11'
+)
+
+class PoseCache(LRUCache):
+    def __init__(self, max_bytes = DEFAULT_POSE_CACHE_BYTES, fps = 60):
+        super().__init__(max_bytes)
+        self.fps = fps
+
+    def key(self, skeleton, animation, time, loop):
+        # Returns the cache key and the quantized time the pose is evaluated at
+        if loop and animation.duration:
+            time %= animation.duration
+        step = round(time * self.fps)
+        return (animation, step, loop, skeleton.skin, skeleton.flip_x, skeleton.flip_y), step / self.fps
+
+    def store(self, key, skeleton):
+        bones = tuple(
+            tuple(getattr(bone, field) for field in BONE_FIELDS) 
+                for bone in skeleton.bones
+        )
+        # Tuples plus one boxed float per field
+        nbytes = sys.getsizeof(bones) + len(bones) * (
+            sys.getsizeof(bones[0]) + 24 * len(BONE_FIELDS)
+        ) if bones else 0
+        slots = tuple(
+            (slot.attachment, slot.color, tuple(getattr(slot, c, None) for c in 'rgba'))
+                for slot in skeleton.slots
+        )
+        nbytes += sys.getsizeof(slots) + len(slots) * 120
+        self.put(key, (bones, slots), nbytes)
+
+    def restore(self, skeleton, pose):
+        bones, slots = pose
+        # The restored world transforms count as a fresh update
+        skeleton.world_version += 1
+        for bone, values in zip(skeleton.bones, bones):
+            (bone.x, bone.y, bone.rotation, bone.scale_x, bone.scale_y,
+             bone.world_x, bone.world_y, bone.world_rotation, bone.world_scale_x, bone.world_scale_y,
+             bone.m00, bone.m01, bone.m10, bone.m11) = values
+            bone.applied = values[:5]
+            bone.changed_at = skeleton.world_version
+        for slot, (attachment, color, rgba) in zip(skeleton.slots, slots):
+            if slot.attachment is not attachment:
+                slot.set_attachment(attachment)
+            slot.color = color
+            for c, value in zip('rgba', rgba):
+                if value is not None:
+                    setattr(slot, c, value)
+
+_transform_caches = weakref.WeakSet()
+
+def forget_texture(texture):
+    # Entries are keyed on the source texture and keep it (and the atlas page
+    # it is cut from) alive, drop them when that texture goes away
+    for cache in list(_transform_caches):
+        cache.forget(texture)
+
+default_transform_cache = TransformCache()
@@ -1,9 +1,18 @@
+import itertools
 import time
 
+# Spreads the low detail pose updates of containers over different frames
+_lod_stagger = itertools.count()
+
 class BaseAnimationContainer:
 	def __init__(self, skeleton):
 		self.skeleton = skeleton
 		self.active_animations = {}
+		# When set, animations are played from tables sampled at bake_fps
+		self.bake_fps = None
+		self.bake_blend = True
+		self._lod_frame = next(_lod_stagger)
+		self._posed = False
 
 	@property
 	def active_animation_names(self):
@@ -33,21 +42,64 @@ class BaseAnimationContainer:
 			return [self._gact(times, name) for name in self.active_animation_names]
 		return [times]
 
+	def get_animation(self, name):
+		animation = self.active_animations[name]
+		if self.bake_fps:
+			animation = animation.bake(self.bake_fps, self.bake_blend)
+		return animation
+
+	@property
+	def baked_nbytes(self):
+		if not self.bake_fps:
+			return 0
+		return sum(self.get_animation(name).baked_nbytes for name in self.active_animations)
+
 	def animate(self, name, time, loop = True, weight = 1):
 		if not self.active_animations:
 			raise ValueError("No active animation")
-		self.active_animations[name].mix(
+		self.get_animation(name).mix(
 				self.skeleton, 
 				time, 
 				loop, 
 				weight
 			)
-	def draw(self, surface):
+	def animate_all(self, layers):
+		# layers are (name, time, loop, weight), blended in a single pass that
+		# matches calling animate for each of them in turn
+		from .mixer import mix_all
+		mix_all(self.skeleton, [
+			(self.get_animation(name), time, loop, weight) for (name, time, loop, weight) in layers
+		])
+	def pose(self, name, time, loop = True, weight = 1):
+		level = self.skeleton.current_lod()
+		self._lod_frame += 1
+		if level is not None and self._posed and self._lod_frame % level.update_interval:
+			# Low detail levels keep the last pose in between updates
+			return
+		self._posed = True
+		pose_cache = self.skeleton.data.pose_cache
+		if pose_cache is None or weight != 1 or len(self.active_animations) != 1:
+			BaseAnimationContainer.animate(self, name, time, loop, weight)
+			self.skeleton.update_world_transform()
+			return
+		key, time = pose_cache.key(self.skeleton, self.get_animation(name), time, loop)
+		cached = pose_cache.get(key)
+		if cached is None:
+			# Entries hold every bone and slot, those the animation does not key
+			# must not carry over whatever the last pose left in them
+			self.skeleton.set_to_bind_pose()
+			BaseAnimationContainer.animate(self, name, time, loop, weight)
+			self.skeleton.update_world_transform()
+			pose_cache.store(key, self.skeleton)
+		else:
+			pose_cache.restore(self.skeleton, cached)
+	def draw(self, surface, dirty = False):
 		self.skeleton.update_world_transform()
-		self.skeleton.draw(surface)
-	def render(self, surface, time, loop = True, mix_weight = []):
-		self.animate(self.active_animation_names[0], time, loop, mix_weight)
-		self.draw(surface)
+		return self.skeleton.draw(surface, dirty)
+	def render(self, surface, time, loop = True, mix_weight = [], dirty = False):
+		# With dirty, returns the rect covering this frame and the last one
+		self.pose(self.active_animation_names[0], time, loop, mix_weight)
+		return self.skeleton.draw(surface, dirty)
 
 class AnimationContainer(BaseAnimationContainer):
 	@property
@@ -76,21 +128,82 @@ class AnimationContainer(BaseAnimationContainer):
 		self.skeleton.flip_y = val
 	@property
 	def skin(self):
-		return self.skeleton.skin.name
+		skin = self.skeleton.skin
+		return skin.name if skin else None
 	@skin.setter
 	def skin(self, val):
 		self.skeleton.set_skin(val)
 	def clone(self):
 		from .skeletons import Skeleton
-		to_r = self.__class__(Skeleton(self.skeleton.data))
+		to_r = self.__class__(Skeleton(
+			self.skeleton.data,
+			rotation_accuracy = self.skeleton.rotation_accuracy,
+			rotation_steps = self.skeleton.rotation_steps
+		))
 		to_r.skin = self.skin
 		to_r.active_animations = self.active_animations
+		to_r.bake_fps = self.bake_fps
+		to_r.bake_blend = self.bake_blend
 		return to_r
 
 
 class AutotimeAnimationContainer(AnimationContainer):
 	def animate(self, name, loop=True, mix_weight = 1):
 		return super().animate(name, time.time(), loop, mix_weight)
-	def render(self, surface, loop = True, weight = 1):
-		self.animate(self.active_animation_names[0], loop, weight)
-		self.draw(surface)
\ No newline at end of file
+	def render(self, surface, loop = True, weight = 1, dirty = False):
+		self.pose(self.active_animation_names[0], time.time(), loop, weight)
+		return self.skeleton.draw(surface, dirty)
+
+
+class BakedAnimationContainer:
+	def __init__(self, sheet, manifest):
+		self.sheet = sheet
+		self.manifest = manifest
+		self.fps = manifest['fps']
+		self.duration = manifest['duration']
+		self.frames = [
+			(sheet.subsurface(frame['rect']), tuple(frame['anchor']))
+				for frame in manifest['frames']
+		]
+		self._flipped = {}
+		self.x = 0
+		self.y = 0
+		self.flip_x = False
+		self.flip_y = False
+		self.last_drawn_rect = None
+
+	@classmethod
+	def load(cls, path):
+		from . import sprite_sheet
+		return cls(*sprite_sheet.load(path))
+
+	def frame_index(self, time, loop = True):
+		# Frames are sampled at i / fps, absorb the rounding of time * fps
+		i = int(time * self.fps + 1e-6)
+		if loop:
+			return i % len(self.frames)
+		return max(0, min(i, len(self.frames) - 1))
+
+	def get_frame(self, i):
+		texture, (anchor_x, anchor_y) = self.frames[i]
+		if not (self.flip_x or self.flip_y):
+			return texture, anchor_x, anchor_y
+		key = (i, self.flip_x, self.flip_y)
+		if key not in self._flipped:
+			import pygame
+			self._flipped[key] = pygame.transform.flip(texture, self.flip_x, self.flip_y)
+		width, height = texture.get_size()
+		if self.flip_x:
+			anchor_x = width - anchor_x
+		if self.flip_y:
+			anchor_y = height - anchor_y
+		return self._flipped[key], anchor_x, anchor_y
+
+	def render(self, surface, time, loop = True, mix_weight = 1, dirty = False):
+		texture, anchor_x, anchor_y = self.get_frame(self.frame_index(time, loop))
+		rect = surface.blit(texture, (self.x - anchor_x, self.y - anchor_y))
+		if not dirty:
+			return rect
+		previous = self.last_drawn_rect
+		self.last_drawn_rect = rect
+		return rect if previous is None else rect.union(previous)
@@ -0,0 +1,266 @@
+import numpy as np
+
+from . import caches
+from . import timelines
+from .pose import ArrayPose
+from .skeletons import Skeleton
+
+# Per instance arrays, each a view on the first len(crowd) entries of a buffer
+# with room for more instances
+INSTANCE_FIELDS = (
+    ('times', float),
+    ('x', float),
+    ('y', float),
+    ('flip_x', bool),
+    ('flip_y', bool),
+    ('loop', bool),
+    ('animation_ids', np.intp),
+)
+ATTACHMENT_FIELDS = (('x', 0.0), ('y', 0.0), ('rotation', 0.0), ('scale_x', 1.0), ('scale_y', 1.0))
+
+class Crowd:
+    def __init__(self, skeleton_data, bake_fps = 60, rotation_accuracy = 1):
+        self.data = skeleton_data
+        self.bake_fps = bake_fps
+        self.rotation_accuracy = rotation_accuracy
+        self._count = 0
+        self._buffers = {name: np.zeros(0, dtype=dtype) for name, dtype in INSTANCE_FIELDS}
+        self._views()
+        self.skins = []
+        # One list per instance, holding the attachment shown by each slot
+        self.attachments = []
+        # Attachment x, y, rotation, scale_x and scale_y per slot and instance,
+        # kept in step with attachments
+        self._attachment_params = np.zeros((len(ATTACHMENT_FIELDS), len(skeleton_data.slots), 0))
+        # (instance, slot) index arrays of the drawn attachments, None once
+        # an attachment changed
+        self._drawn = None
+        # One column per instance, poses carry over between evaluations
+        self.pose = ArrayPose(skeleton_data.bones, instances = 0)
+
+        self.slot_bones = np.array(
+            [skeleton_data.find_bone_index(slot.bone_data.name) for slot in skeleton_data.slots],
+            dtype=np.intp
+        )
+        self._bind_pose = np.array([
+            [getattr(bone_data, field) for bone_data in skeleton_data.bones]
+                for field in ('x', 'y', 'rotation', 'scale_x', 'scale_y')
+        ])
+        self._animations = []
+        self._animation_ids = {}
+        self._templates = {}
+        self._skin_params = {}
+
+    def __len__(self):
+        return self._count
+
+    def _views(self):
+        for name, buffer in self._buffers.items():
+            setattr(self, name, buffer[:self._count])
+
+    def _grow(self):
+        # Capacity doubles, adding n instances costs O(n) copies in total
+        capacity = max(16, 2 * len(self._buffers['times']))
+        count = self._count
+        for name, buffer in self._buffers.items():
+            grown = np.zeros(capacity, dtype=buffer.dtype)
+            grown[:count] = buffer[:count]
+            self._buffers[name] = grown
+        params = np.zeros(self._attachment_params.shape[:2] + (capacity,))
+        params[..., :count] = self._attachment_params[..., :count]
+        self._attachment_params = params
+        pose = ArrayPose(self.data.bones, instances = capacity)
+        pose.local[..., :count] = self.pose.local[..., :count]
+        pose.world[..., :count] = self.pose.world[..., :count]
+        self.pose = pose
+
+    @property
+    def transform_cache(self) -> caches.TransformCache:
+        if self.data.transform_cache is not None:
+            return self.data.transform_cache
+        return caches.default_transform_cache
+
+    def _template(self, skin_name):
+        # Instances of the same skin resolve attachments through one skeleton
+        skeleton = self._templates.get(skin_name)
+        if skeleton is None:
+            skeleton = Skeleton(self.data)
+            if skin_name:
+                skeleton.set_skin(skin_name)
+            self._templates[skin_name] = skeleton
+        return skeleton
+
+    def _animation_id(self, animation_name):
+        if animation_name not in self._animation_ids:
+            animation = self.data.find_animation(animation_name).bake(self.bake_fps)
+            self._animation_ids[animation_name] = len(self._animations)
+            self._animations.append(animation)
+        return self._animation_ids[animation_name]
+
+    def add(self, animation_name, x = 0, y = 0, time = 0.0, loop = True, flip_x = False, flip_y = False, skin = None):
+        animation_id = self._animation_id(animation_name)
+        index = self._count
+        if index == len(self._buffers['times']):
+            self._grow()
+        self._count += 1
+        self._views()
+        self.times[index] = time
+        self.x[index] = x
+        self.y[index] = y
+        self.flip_x[index] = flip_x
+        self.flip_y[index] = flip_y
+        self.loop[index] = loop
+        self.animation_ids[index] = animation_id
+        # New instances start from the bind pose
+        self.pose.local[..., index] = self._bind_pose
+        self.skins.append(skin)
+        self.attachments.append(None)
+        self._attach_skin(index)
+        return index
+
+    def set_animation(self, index, animation_name, time = 0.0, loop = True):
+        self.animation_ids[index] = self._animation_id(animation_name)
+        self.times[index] = time
+        self.loop[index] = loop
+
+    def set_skin(self, index, skin):
+        self.skins[index] = skin
+        self._attach_skin(index)
+
+    def _params(self, attachment):
+        return [getattr(attachment, field) if attachment else default for field, default in ATTACHMENT_FIELDS]
+
+    def _attach_skin(self, index):
+        skin = self.skins[index]
+        if skin not in self._skin_params:
+            attachments = [slot.attachment for slot in self._template(skin).slots]
+            params = np.array([self._params(attachment) for attachment in attachments]).T
+            self._skin_params[skin] = (attachments, params.reshape(len(ATTACHMENT_FIELDS), len(attachments)))
+        attachments, params = self._skin_params[skin]
+        self.attachments[index] = list(attachments)
+        self._attachment_params[..., index] = params
+        self._drawn = None
+
+    def _set_attachment(self, index, slot_index, attachment):
+        row = self.attachments[index]
+        if row[slot_index] is attachment:
+            return
+        row[slot_index] = attachment
+        self._attachment_params[:, slot_index, index] = self._params(attachment)
+        self._drawn = None
+
+    def update(self, delta):
+        self.times += delta
+
+    def _apply(self, animation, selected):
+        x, y, rotation, scale_x, scale_y = self.pose.local
+        times = self.times[selected]
+        if animation.duration:
+            times = np.where(self.loop[selected], times % animation.duration, times)
+
+        for timeline in animation.timelines:
+            values, active = timeline.baked.get_many(times)
+            if not active.any():
+                continue
+            target = selected[active]
+            values = values[active]
+            if isinstance(timeline, timelines.AttachmentTimeline):
+                slot_index = timeline.slot_index
+                attachments = self.attachments
+                for i, name in zip(target.tolist(), values.tolist()):
+                    if name is None:
+                        continue
+                    current = attachments[i][slot_index]
+                    if current is not None and current.name == name:
+                        continue
+                    template = self._template(self.skins[i])
+                    self._set_attachment(i, slot_index, template.get_attachment_by_index(slot_index, name))
+            elif isinstance(timeline, timelines.RotateTimeline):
+                bone_data = self.data.bones[timeline.bone_index]
+                rotation[timeline.bone_index, target] = bone_data.rotation + timelines.mod_m180_p180(values)
+            elif isinstance(timeline, timelines.ScaleTimeline):
+                bone_data = self.data.bones[timeline.bone_index]
+                scale_x[timeline.bone_index, target] = bone_data.scale_x - 1 + values[:, 0]
+                scale_y[timeline.bone_index, target] = bone_data.scale_y - 1 + values[:, 1]
+            elif isinstance(timeline, timelines.TranslateTimeline):
+                bone_data = self.data.bones[timeline.bone_index]
+                x[timeline.bone_index, target] = bone_data.x + values[:, 0]
+                y[timeline.bone_index, target] = bone_data.y + values[:, 1]
+            # Slot colors are not used when drawing, they are skipped
+
+    def evaluate(self):
+        # Like Animation.mix, timelines that have not started leave the bones
+        # as the last evaluation posed them
+        for animation_id, animation in enumerate(self._animations):
+            selected = np.flatnonzero(self.animation_ids == animation_id)
+            if len(selected):
+                self._apply(animation, selected)
+        # Spare columns are evaluated too, their flips stay False
+        self.pose.update_world_transform(self._buffers['flip_x'], self._buffers['flip_y'])
+
+    def _drawn_indices(self):
+        # Rebuilt only after an attachment changed, in instance then slot order
+        if self._drawn is None:
+            pairs = [
+                (i, s) for i, row in enumerate(self.attachments)
+                    for s, attachment in enumerate(row)
+                        if attachment and attachment.texture
+            ]
+            instances = np.array([i for i, _ in pairs], dtype=np.intp)
+            slots = np.array([s for _, s in pairs], dtype=np.intp)
+            self._drawn = (instances, slots, [self.attachments[i][s] for i, s in pairs])
+        return self._drawn
+
+    def draw_list(self):
+        import pygame
+        transform_cache = self.transform_cache
+        instances, slot_indices, attachments = self._drawn_indices()
+        if not attachments:
+            return []
+        # Every array below has one entry per drawn attachment
+        bones = self.slot_bones[slot_indices]
+        world_x, world_y, world_rotation, world_scale_x, world_scale_y, m00, m01, m10, m11 = (
+            field[bones, instances] for field in self.pose.world
+        )
+        attachment_x, attachment_y, attachment_rotation, attachment_scale_x, attachment_scale_y = (
+            self._attachment_params[:, slot_indices, instances]
+        )
+        flip_x = self.flip_x[instances]
+        flip_y = self.flip_y[instances]
+        local_x = attachment_x * m00 + attachment_y * m01
+        local_y = attachment_x * m10 + attachment_y * m11
+        rotation = -(world_rotation + attachment_rotation)
+        x_scale = world_scale_x + attachment_scale_x - 1
+        y_scale = world_scale_y + attachment_scale_y - 1
+        x_scale = np.where(flip_x, -x_scale, x_scale)
+        y_scale = np.where(flip_y, -y_scale, y_scale)
+        rotation = np.where(flip_x != flip_y, -rotation, rotation)
+        screen_x = self.x[instances] + world_x + local_x
+        screen_y = self.y[instances] - (world_y + local_y)
+
+        to_draw = []
+        rotation_accuracy = self.rotation_accuracy
+        for attachment, angle, sx, sy, x, y in zip(
+            attachments, rotation.tolist(), x_scale.tolist(), y_scale.tolist(), screen_x.tolist(), screen_y.tolist()
+        ):
+            if attachment.rotation_sheet:
+                texture = transform_cache.transform(
+                    attachment.rotated(angle), 0, abs(sx), abs(sy)
+                )
+            else:
+                texture = transform_cache.transform(
+                    attachment.texture, angle, abs(sx), abs(sy), rotation_accuracy
+                )
+            if sx < 0 or sy < 0:
+                texture = pygame.transform.flip(texture, sx < 0, sy < 0)
+            cx, cy = texture.get_rect().center
+            to_draw.append((texture, (x - cx, y - cy)))
+        return to_draw
+
+    def draw(self, surface):
+        surface.blits(self.draw_list())
+
+    def render(self, surface, delta = 0.0):
+        self.update(delta)
+        self.evaluate()
+        self.draw(surface)
@@ -0,0 +1,39 @@
+import sys
+
+import pygame
+
+# Byte order of a 32 bit SRCALPHA surface created without a display, textures
+# converted to it blit onto offscreen targets without any per pixel conversion
+PIXEL_FORMAT = 'BGRA' if sys.byteorder == 'little' else 'ARGB'
+
+def display_available():
+    return pygame.display.get_init() and pygame.display.get_surface() is not None
+
+def convert_texture(image):
+    if display_available():
+        return image.convert_alpha()
+    return pygame.image.frombytes(
+        pygame.image.tobytes(image, PIXEL_FORMAT), 
+        image.get_size(), 
+        PIXEL_FORMAT
+    )
+
+def new_target(size, background = None):
+    surface = pygame.Surface(size, pygame.SRCALPHA, 32)
+    if background is not None:
+        surface.fill(background)
+    return surface
+
+def to_rgba(surface):
+    return pygame.image.tobytes(surface, 'RGBA')
+
+def render(container, size, time, loop = True, weight = 1, background = None, target = None):
+    if target is None:
+        target = new_target(size, background)
+    elif background is not None:
+        target.fill(background)
+    container.render(target, time, loop, weight)
+    return target
+
+def render_rgba(container, size, time, loop = True, weight = 1, background = None):
+    return to_rgba(render(container, size, time, loop, weight, background))
@@ -0,0 +1,18 @@
+class NameIndex:
+    # Maps item.name to the position of the first item with that name. Lists
+    # are only ever appended to, new items are indexed on the next lookup
+    def __init__(self):
+        self.items = None
+        self.count = 0
+        self.indices = {}
+
+    def find(self, items, name) -> int:
+        if items is not self.items or self.count > len(items):
+            self.items = items
+            self.count = 0
+            self.indices = {}
+        if self.count < len(items):
+            for i in range(self.count, len(items)):
+                self.indices.setdefault(items[i].name, i)
+            self.count = len(items)
+        return self.indices.get(name, -1)
@@ -0,0 +1,24 @@
+from collections import namedtuple
+
+# A level applies from min_scale (the on-screen scale of the skeleton) up to
+# the next level. Attachments drawn smaller than min_area pixels are dropped,
+# the pose is evaluated every update_interval frames and rotation_accuracy,
+# when set, replaces the skeleton's own
+LodLevel = namedtuple('LodLevel', ['min_scale', 'min_area', 'update_interval', 'rotation_accuracy'])
+
+DEFAULT_LEVELS = (
+    LodLevel(0.75, 0, 1, None),
+    LodLevel(0.4, 64, 2, 0.5),
+    LodLevel(0.2, 256, 3, 0.2),
+    LodLevel(0.0, 1024, 4, 0.1),
+)
+
+def select(levels, scale):
+    # Levels may come in any order, the most detailed one that applies wins
+    best = None
+    for level in levels:
+        if scale >= level.min_scale and (best is None or level.min_scale > best.min_scale):
+            best = level
+    if best is None:
+        best = min(levels, key = lambda level: level.min_scale)
+    return best
@@ -0,0 +1,158 @@
+from collections import deque
+
+from . import timelines
+
+def mix_all(skeleton, layers):
+    # layers are (animation, time, loop, alpha) in the order Animation.mix
+    # would be called. Bone values are blended in locals and every bone is
+    # written once, the result matches calling mix for each layer in turn
+    bones = skeleton.bones
+    bones_data = skeleton.data.bones
+    cursors = skeleton.timeline_cursors
+    locals_ = {}
+    for animation, time, loop, alpha in layers:
+        if loop and animation.duration:
+            time %= animation.duration
+        for timeline in animation.bone_timelines:
+            local = locals_.get(timeline.bone_index)
+            if local is None:
+                bone = bones[timeline.bone_index]
+                local = locals_[timeline.bone_index] = [bone.x, bone.y, bone.rotation, bone.scale_x, bone.scale_y]
+            try:
+                timeline.mix_local(local, bones_data[timeline.bone_index], time, alpha, cursors)
+            except timelines.SoonError:
+                pass
+        for timeline in animation.slot_timelines:
+            try:
+                timeline.apply(skeleton, time, alpha)
+            except timelines.SoonError:
+                pass
+    for bone_index, (x, y, rotation, scale_x, scale_y) in locals_.items():
+        bone = bones[bone_index]
+        bone.x = x
+        bone.y = y
+        bone.rotation = rotation
+        bone.scale_x = scale_x
+        bone.scale_y = scale_y
+
+class TrackEntry:
+    def __init__(self, animation, loop = True, weight = 1, mix_duration = 0, delay = None):
+        # animation is None for an empty entry, which fades the track out
+        self.animation = animation
+        self.loop = loop
+        self.weight = weight
+        self.mix_duration = mix_duration
+        self.delay = delay
+        self.time = 0.0
+        self.mix_time = 0.0
+        self.previous = None
+
+    @property
+    def complete(self):
+        return (
+            self.animation is not None and not self.loop
+                and self.time >= self.animation.duration
+        )
+
+    @property
+    def mix_alpha(self):
+        # Entries started on an empty track fade in over whatever is below
+        if not self.mix_duration:
+            return 1.0
+        return min(1.0, self.mix_time / self.mix_duration)
+
+class Mixer:
+    def __init__(self, skeleton, default_mix = 0.0, bake_fps = None):
+        self.skeleton = skeleton
+        self.default_mix = default_mix
+        self.bake_fps = bake_fps
+        self.tracks = {}
+        self.queues = {}
+
+    def find_animation(self, name):
+        # Raises ValueError for an unknown name
+        animation = self.skeleton.data.find_animation(name)
+        if self.bake_fps:
+            animation = animation.bake(self.bake_fps)
+        return animation
+
+    def _start(self, track, entry):
+        current = self.tracks.get(track)
+        if current is not None and entry.mix_duration:
+            # Mixing out of a mix keeps only its newest animation
+            current.previous = None
+            entry.previous = current
+        self.tracks[track] = entry
+
+    def set_animation(self, track, name, loop = True, weight = 1, mix = None):
+        entry = TrackEntry(
+            self.find_animation(name), loop, weight,
+            self.default_mix if mix is None else mix
+        )
+        self.queues.pop(track, None)
+        self._start(track, entry)
+        return entry
+
+    def add_animation(self, track, name, loop = False, weight = 1, mix = None, delay = None):
+        # Starts after delay seconds of the entry before it, or when that entry
+        # completes if no delay is given
+        entry = TrackEntry(
+            self.find_animation(name), loop, weight,
+            self.default_mix if mix is None else mix, delay
+        )
+        if track not in self.tracks:
+            self._start(track, entry)
+        else:
+            self.queues.setdefault(track, deque()).append(entry)
+        return entry
+
+    def clear_track(self, track, mix = 0):
+        # Returns the empty entry fading the track out, if any
+        self.queues.pop(track, None)
+        if not mix:
+            self.tracks.pop(track, None)
+        elif track in self.tracks:
+            entry = TrackEntry(None, mix_duration = mix)
+            self._start(track, entry)
+            return entry
+
+    def clear_tracks(self):
+        self.tracks.clear()
+        self.queues.clear()
+
+    def update(self, delta):
+        for track in list(self.tracks):
+            entry = self.tracks[track]
+            entry.time += delta
+            entry.mix_time += delta
+            if entry.previous is not None:
+                entry.previous.time += delta
+                if entry.mix_time >= entry.mix_duration:
+                    entry.previous = None
+            if entry.animation is None and entry.previous is None:
+                del self.tracks[track]
+                continue
+            queue = self.queues.get(track)
+            if queue:
+                following = queue[0]
+                if entry.complete if following.delay is None else entry.time >= following.delay:
+                    queue.popleft()
+                    self._start(track, following)
+
+    def layers(self):
+        layers = []
+        for track in sorted(self.tracks):
+            entry = self.tracks[track]
+            alpha = entry.mix_alpha
+            previous = entry.previous
+            if entry.animation is None:
+                if previous is not None:
+                    layers.append((previous.animation, previous.time, previous.loop, previous.weight * (1 - alpha)))
+                continue
+            if previous is not None and previous.animation is not None:
+                layers.append((previous.animation, previous.time, previous.loop, previous.weight))
+            layers.append((entry.animation, entry.time, entry.loop, entry.weight * alpha))
+        return layers
+
+    def apply(self):
+        mix_all(self.skeleton, self.layers())
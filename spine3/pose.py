@@ -0,0 +1,73 @@
+import numpy as np
+
+LOCAL_FIELDS = ('x', 'y', 'rotation', 'scale_x', 'scale_y')
+WORLD_FIELDS = (
+    'world_x', 'world_y', 'world_rotation', 'world_scale_x', 'world_scale_y',
+    'm00', 'm01', 'm10', 'm11'
+)
+
+class ArrayPose:
+    # Local and world transforms of many instances of one skeleton, evaluated
+    # a hierarchy level at a time, see crowd.Crowd
+    def __init__(self, bones_data, instances = None):
+        count = len(bones_data)
+        # With instances every field gets a trailing axis, one column per instance
+        shape = (count,) if instances is None else (count, instances)
+        self.local = np.zeros((len(LOCAL_FIELDS),) + shape)
+        self.world = np.zeros((len(WORLD_FIELDS),) + shape)
+        self.parents = np.full(count, -1, dtype=np.intp)
+        self.levels = self._build_levels(bones_data)
+
+    def _build_levels(self, bones_data):
+        index_of = {id(bone_data): i for (i, bone_data) in enumerate(bones_data)}
+        depths = []
+        for i, bone_data in enumerate(bones_data):
+            if bone_data.parent:
+                # Parents always precede their children in the skeleton data
+                parent = index_of[id(bone_data.parent)]
+                self.parents[i] = parent
+                depths.append(depths[parent] + 1)
+            else:
+                depths.append(0)
+        levels = []
+        for depth in range(max(depths, default=-1) + 1):
+            index = np.array([i for (i, d) in enumerate(depths) if d == depth], dtype=np.intp)
+            parent = self.parents[index]
+            levels.append((index, parent if depth else None))
+        return levels
+
+    def set_to_bind_pose(self, bones_data):
+        columns = (len(bones_data),) + (1,) * (self.local.ndim - 2)
+        for row, field in enumerate(LOCAL_FIELDS):
+            values = [getattr(bone_data, field) for bone_data in bones_data]
+            self.local[row] = np.reshape(values, columns)
+
+    def update_world_transform(self, flip_x, flip_y):
+        x, y, rotation, scale_x, scale_y = self.local
+        world_x, world_y, world_rotation, world_scale_x, world_scale_y, m00, m01, m10, m11 = self.world
+        # Flips are either booleans or one boolean per instance
+        sign_x = np.where(flip_x, -1.0, 1.0)
+        sign_y = np.where(flip_y, -1.0, 1.0)
+        for index, parent in self.levels:
+            if parent is None:
+                world_x[index] = x[index]
+                world_y[index] = y[index]
+                world_scale_x[index] = scale_x[index]
+                world_scale_y[index] = scale_y[index]
+                world_rotation[index] = rotation[index]
+            else:
+                lx = x[index]
+                ly = y[index]
+                world_x[index] = lx * m00[parent] + ly * m01[parent] + world_x[parent]
+                world_y[index] = lx * m10[parent] + ly * m11[parent] + world_y[parent]
+                world_scale_x[index] = world_scale_x[parent] * scale_x[index]
+                world_scale_y[index] = world_scale_y[parent] * scale_y[index]
+                world_rotation[index] = world_rotation[parent] + rotation[index]
+
+            radians = np.radians(world_rotation[index])
+            cos = np.cos(radians)
+            sin = np.sin(radians)
+            m00[index] = cos * world_scale_x[index] * sign_x
+            m01[index] = -sin * world_scale_y[index] * sign_x
+            m10[index] = sin * world_scale_x[index] * sign_y
+            m11[index] = cos * world_scale_y[index] * sign_y
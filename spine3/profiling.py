@@ -0,0 +1,170 @@
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# The enabled Profiler, None while profiling is off
+active = None
+
+_originals = []
+# Phases being timed on each thread
+_running = threading.local()
+
+class Profiler:
+    def __init__(self, callback = None, max_events = 1000000):
+        # callback(phase, seconds, counters) runs after every timed call
+        self.callback = callback
+        self.max_events = max_events
+        self.phases = {}
+        self.counters = {}
+        self.events = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, phase, start, end, counters = None):
+        seconds = end - start
+        with self._lock:
+            stats = self.phases.get(phase)
+            if stats is None:
+                stats = self.phases[phase] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if counters:
+                for name, value in counters.items():
+                    self.counters[name] = self.counters.get(name, 0) + value
+            if len(self.events) < self.max_events:
+                self.events.append((phase, start, seconds, threading.get_ident(), counters))
+        if self.callback is not None:
+            self.callback(phase, seconds, counters)
+
+    def reset(self):
+        with self._lock:
+            self.phases.clear()
+            self.counters.clear()
+            self.events.clear()
+            self._origin = time.perf_counter()
+
+    def stats(self):
+        with self._lock:
+            phases = {
+                phase: {
+                    'count': count,
+                    'total': total,
+                    'mean': total / count,
+                    'max': longest,
+                } for phase, (count, total, longest) in self.phases.items()
+            }
+            return {'phases': phases, 'counters': dict(self.counters)}
+
+    def chrome_trace(self):
+        # Complete ("X") events in microseconds, loadable in chrome://tracing
+        # and Perfetto
+        pid = os.getpid()
+        with self._lock:
+            events = [{
+                'name': phase,
+                'ph': 'X',
+                'ts': (start - self._origin) * 1e6,
+                'dur': seconds * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': counters or {},
+            } for phase, start, seconds, tid, counters in self.events]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path):
+        Path(path).write_text(json.dumps(self.chrome_trace()))
+
+    def __enter__(self):
+        enable(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        disable()
+
+def _draw_counters(skeleton):
+    cache = skeleton.transform_cache
+    hits, misses = cache.hits, cache.misses
+    culled = dict(skeleton.cull_counters)
+    def after():
+        counters = {
+            name: value - culled[name] for name, value in skeleton.cull_counters.items()
+        }
+        counters['transform_cache_hits'] = cache.hits - hits
+        counters['transform_cache_misses'] = cache.misses - misses
+        return counters
+    return after
+
+def _pose_counters(container):
+    cache = container.skeleton.data.pose_cache
+    if cache is None:
+        return None
+    hits, misses = cache.hits, cache.misses
+    def after():
+        return {
+            'pose_cache_hits': cache.hits - hits,
+            'pose_cache_misses': cache.misses - misses,
+        }
+    return after
+
+def _wrap(function, phase, counters):
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        profiler = active
+        running = getattr(_running, 'phases', None)
+        if running is None:
+            running = _running.phases = set()
+        # An override calling super() under the same phase is timed once, by
+        # the outermost call
+        if profiler is None or phase in running:
+            return function(self, *args, **kwargs)
+        after = counters(self) if counters else None
+        running.add(phase)
+        start = time.perf_counter()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            running.discard(phase)
+            profiler.record(phase, start, end, after() if after else None)
+    return wrapper
+
+def _hooks():
+    from .animation import Animation
+    from .containers import AutotimeAnimationContainer, BaseAnimationContainer
+    from .skeletons import Skeleton
+    return (
+        (BaseAnimationContainer, 'animate', 'container.animate', None),
+        (BaseAnimationContainer, 'pose', 'container.pose', _pose_counters),
+        (BaseAnimationContainer, 'draw', 'container.draw', None),
+        (BaseAnimationContainer, 'render', 'container.render', None),
+        (AutotimeAnimationContainer, 'animate', 'container.animate', None),
+        (AutotimeAnimationContainer, 'render', 'container.render', None),
+        (Animation, 'mix', 'animation.mix', None),
+        (Skeleton, 'update_world_transform', 'skeleton.update_world_transform', None),
+        (Skeleton, 'draw', 'skeleton.draw', _draw_counters),
+    )
+
+def enable(profiler = None):
+    # The hooks are only installed while profiling, disabled code runs the
+    # original methods untouched
+    global active
+    if profiler is None:
+        profiler = Profiler()
+    if not _originals:
+        for cls, name, phase, counters in _hooks():
+            function = cls.__dict__[name]
+            _originals.append((cls, name, function))
+            setattr(cls, name, _wrap(function, phase, counters))
+    active = profiler
+    return profiler
+
+def disable():
+    global active
+    active = None
+    while _originals:
+        cls, name, function = _originals.pop()
+        setattr(cls, name, function)
@@ -12,11 +12,17 @@ def main():
     screen = pygame_boilerplate_init()
 
     skeleton = spine3.utils.autoload_container(data_dir, "spineboy", autotime = False)
-    skeleton.active_animation_names = ["walk", "jump"]
 
     skeleton.x = -50
     skeleton.y = 400
 
+    # Track 0 walks, the jump is layered on track 1 and faded in and out.
+    # While only jumping the walk track is cleared. Entries are started at
+    # the demo time, a phase begins part way into the frame that enters it
+    mixer = spine3.mixer.Mixer(skeleton.skeleton)
+    mixer.set_animation(0, "walk")
+    phase = "walk"
+
     clock = pygame.time.Clock()    
 
     done = False
@@ -31,7 +37,7 @@ def main():
 
         time += delta / 1000.00
 
-        jump = skeleton.active_animations["jump"].duration
+        jump = skeleton.skeleton.data.find_animation("jump").duration
         before_jump = 1.0
         blend_in = 0.4
         blend_out = 0.4
@@ -47,27 +53,34 @@ def main():
         
         screen.fill((0, 0, 0))
 
+        mixer.update(delta / 1000.00)
+
         if time > total:
             # restart
             time = 0.0
             skeleton.x = -50.0
-        elif time > before_jump + jump:
-            # just walk after jump
-            skeleton.animate("walk", time, True)
+            mixer.clear_tracks()
+            mixer.set_animation(0, "walk")
+            phase = "walk"
         elif time > blend_out_start:
-            # blend out jump
-            skeleton.animate("walk", time, True)
-            skeleton.animate("jump", time - before_jump, False, 1.0 - (time - blend_out_start) / blend_out)
+            if phase != "blend out":
+                # blend out jump, walk picks up where it would have been
+                mixer.set_animation(0, "walk").time = time
+                mixer.clear_track(1, blend_out).mix_time = time - blend_out_start
+                phase = "blend out"
         elif time > before_jump + blend_in:
-            # just jump
-            skeleton.animate("jump", time - before_jump, False)
+            if phase != "jump":
+                # just jump
+                mixer.clear_track(0)
+                phase = "jump"
         elif time > before_jump:
-            # blend in jump
-            skeleton.animate("walk", time, True)
-            skeleton.animate("jump", time - before_jump, False, (time - before_jump) / blend_in)
-        else:
-            # just walk before jump
-            skeleton.animate("walk", time, True)
+            if phase != "blend in":
+                # blend in jump
+                entry = mixer.set_animation(1, "jump", loop = False, mix = blend_in)
+                entry.time = entry.mix_time = time - before_jump
+                phase = "blend in"
+
+        mixer.apply()
 
         skeleton.draw(screen)
         pygame.display.set_caption(f'Spine Runtime: FPS: {int(clock.get_fps())}')
@@ -70,8 +70,11 @@ class PyGameRegionAttachment(BaseRegionAttachment):
         self.v = region.y
         self.v2 = self.v + region.height
         self.rect = pygame.Rect((self.u, self.v, region.width, region.height))
-        self.texture = region.page.texture.subsurface(self.rect)
+        self.region = region
+        self._texture = None
         self.offset = pygame.Rect(0, 0, region.width, region.height)
+        self._rotation_sheet = None
+        self.rotation_steps = None
         if region.rotate:
             self.verticies[1].tex_coords.x = self.u
             self.verticies[1].tex_coords.y = self.v2
@@ -91,6 +94,63 @@ class PyGameRegionAttachment(BaseRegionAttachment):
             self.verticies[3].tex_coords.x = self.u2
             self.verticies[3].tex_coords.y = self.v2
 
+    @property
+    def texture(self):
+        # The atlas page is only decoded once one of its attachments is used
+        if self._texture is None:
+            page = self.region.page
+            self._texture = page.texture.subsurface(self.rect)
+            page.attachments.add(self)
+        return self._texture
+
+    def release(self):
+        from . import caches
+        if self._texture is not None:
+            caches.forget_texture(self._texture)
+            self._texture = None
+            self.region.page.attachments.discard(self)
+        # The sheet starts with the page subsurface, keeping it would keep the
+        # page decoded. It is baked again on next use
+        if self._rotation_sheet is not None:
+            for texture in self._rotation_sheet:
+                caches.forget_texture(texture)
+            self._rotation_sheet = None
+
+    def bake_rotations(self, steps):
+        self.rotation_steps = steps
+        self._rotation_sheet = None
+        return self.rotation_sheet
+
+    @property
+    def rotation_sheet(self):
+        if self._rotation_sheet is None and self.rotation_steps:
+            import pygame
+            step = 360.0 / self.rotation_steps
+            self._rotation_sheet = [self.texture] + [
+                pygame.transform.rotate(self.texture, -i * step) 
+                    for i in range(1, self.rotation_steps)
+            ]
+        return self._rotation_sheet
+
+    @property
+    def rotation_sheet_bytes(self):
+        if not self._rotation_sheet:
+            return 0
+        return sum(
+            texture.get_width() * texture.get_height() * texture.get_bytesize()
+                for texture in self._rotation_sheet
+        )
+
+    def rotated(self, angle, steps = None):
+        sheet = self.rotation_sheet
+        baked_steps = len(sheet)
+        # A skeleton may ask for a coarser resolution than the one baked
+        stride = 1
+        if steps and steps < baked_steps:
+            stride = baked_steps // steps
+        index = round(angle * baked_steps / 360.0 / stride) * stride
+        return sheet[index % baked_steps]
+
     def draw(self, slot):
         skeleton = slot.skeleton
 
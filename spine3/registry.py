@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from . import atlas
+from . import attachment_loader
+from . import skeletons
+
+def file_stamp(path):
+    # Assets are told apart by resolved path and mtime, an edited file loads anew
+    path = Path(path).resolve()
+    stat = path.stat()
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+class AssetRegistry:
+    def __init__(self, workers = 2):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        # stamp -> Future of the Atlas
+        self._atlases = {}
+        # (json stamp, atlas stamp, scale, rotation_steps, compiled) -> Future of the SkeletonData
+        self._skeletons = {}
+        # Live Skeleton instances per skeleton key
+        self._refs = {}
+        # Keys handed out as SkeletonData, kept by collect() until unpinned
+        self._pinned = set()
+
+    def _get(self, table, key, load):
+        # One thread loads a given key, any other asking for it waits on it
+        with self._lock:
+            future = table.get(key)
+            owner = future is None
+            if owner:
+                future = table[key] = Future()
+        if owner:
+            try:
+                future.set_result(load())
+            except BaseException as e:
+                with self._lock:
+                    table.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def atlas(self, path):
+        stamp = file_stamp(path)
+        return self._get(self._atlases, stamp, lambda: atlas.Atlas(file=Path(stamp[0])))
+
+    def _paths(self, dir, name):
+        dir = Path(dir)
+        atlas_path = (dir / name).with_suffix('.atlas').resolve()
+        skeleton_path = (dir / name).with_suffix('.json').resolve()
+        if not atlas_path.exists():
+            raise FileNotFoundError(f"Atlas {atlas_path} not fount")
+        if not skeleton_path.exists():
+            raise FileNotFoundError(f"Skeleton {skeleton_path} not fount")
+        return atlas_path, skeleton_path
+
+    def _skeleton_key(self, dir, name, scale, rotation_steps, compiled):
+        atlas_path, skeleton_path = self._paths(dir, name)
+        return (file_stamp(skeleton_path), file_stamp(atlas_path), scale, rotation_steps, compiled)
+
+    def _load_skeleton_data(self, key):
+        (skeleton_path, _, _), atlas_stamp, scale, rotation_steps, compiled = key
+        loader = attachment_loader.AttachmentLoader(self.atlas(atlas_stamp[0]), rotation_steps = rotation_steps)
+        if compiled:
+            # Uses (and refreshes) the .skel3 file compiled next to the JSON
+            from . import binary
+            return binary.load_or_parse(Path(skeleton_path), loader, scale)
+        with open(skeleton_path, 'r') as fh:
+            return skeletons.SkeletonData.build_from(json.load(fh), loader, scale)
+
+    def skeleton_data(self, dir, name, scale = 1, rotation_steps = None, compiled = False):
+        # The registry cannot tell when the caller is done with the data, the
+        # rig stays loaded until unpin
+        key = self._skeleton_key(dir, name, scale, rotation_steps, compiled)
+        with self._lock:
+            self._pinned.add(key)
+        return self._get(self._skeletons, key, lambda: self._load_skeleton_data(key))
+
+    def unpin(self, dir, name, scale = 1, rotation_steps = None, compiled = False):
+        key = self._skeleton_key(dir, name, scale, rotation_steps, compiled)
+        with self._lock:
+            self._pinned.discard(key)
+
+    def skeleton(self, dir, name, scale = 1, rotation_steps = None, compiled = False, **options):
+        # A new instance only allocates its pose, the data and textures are shared
+        key = self._skeleton_key(dir, name, scale, rotation_steps, compiled)
+        data = self._get(self._skeletons, key, lambda: self._load_skeleton_data(key))
+        skeleton = skeletons.Skeleton(data, **options)
+        skeleton.set_to_bind_pose()
+        with self._lock:
+            self._refs[key] = self._refs.get(key, 0) + 1
+        weakref.finalize(skeleton, self._release, key)
+        return skeleton
+
+    def _release(self, key):
+        with self._lock:
+            if key in self._refs:
+                self._refs[key] -= 1
+
+    def refs(self, dir, name, scale = 1, rotation_steps = None, compiled = False):
+        key = self._skeleton_key(dir, name, scale, rotation_steps, compiled)
+        with self._lock:
+            return self._refs.get(key, 0)
+
+    def preload(self, rigs, decode = True, **options):
+        # rigs are (dir, name) pairs, returns one Future of SkeletonData per rig.
+        # With decode the atlas pages are decoded in the background as well.
+        # Preloaded rigs are pinned like those from skeleton_data
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers = self.workers or os.cpu_count() or 1,
+                    thread_name_prefix = 'spine3-preload'
+                )
+        def load(dir, name):
+            data = self.skeleton_data(dir, name, **options)
+            if decode:
+                self.atlas(self._paths(dir, name)[0]).preload(data.skins)
+            return data
+        return [self._executor.submit(load, dir, name) for (dir, name) in rigs]
+
+    def collect(self):
+        # Drops rigs without live skeletons or pins, then unloads the pages of atlases
+        # no remaining rig uses. Returns the number of rigs dropped
+        with self._lock:
+            unused = [
+                key for key, future in self._skeletons.items()
+                    if future.done() and not self._refs.get(key) and key not in self._pinned
+            ]
+            for key in unused:
+                del self._skeletons[key]
+                self._refs.pop(key, None)
+            used_atlases = {key[1] for key in self._skeletons}
+            dropped = [
+                future for stamp, future in self._atlases.items()
+                    if future.done() and stamp not in used_atlases
+            ]
+            self._atlases = {
+                stamp: future for stamp, future in self._atlases.items()
+                    if not future.done() or stamp in used_atlases
+            }
+        for future in dropped:
+            if future.exception() is None:
+                for page in future.result().pages:
+                    page.unload()
+        return len(unused)
+
+    def clear(self):
+        with self._lock:
+            self._refs.clear()
+            self._pinned.clear()
+            self._skeletons.clear()
+            self._atlases.clear()
+
+default_registry = AssetRegistry()
@@ -0,0 +1,104 @@
+import argparse
+import math
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pygame
+
+from . import headless
+
+# Renders frames [start, stop) of one skin / animation pair into out
+Job = namedtuple('Job', ['dir', 'name', 'skin', 'animation', 'start', 'stop', 'fps', 'canvas', 'origin', 'out'])
+
+# Containers loaded by this worker process, keyed by (dir, name)
+_containers = {}
+
+def _container(dir, name):
+    from . import utils
+    key = (dir, name)
+    if key not in _containers:
+        _containers[key] = utils.autoload_container(dir, name)
+    return _containers[key]
+
+def frame_path(out, name, skin, animation, frame):
+    return Path(out) / name / (skin or 'default') / animation / ('%05d.png' % frame)
+
+def render_job(job):
+    container = _container(job.dir, job.name)
+    # The container may have rendered another skin for an earlier job, None
+    # goes back to the default skin
+    container.skeleton.set_skin(job.skin)
+    container.active_animation_names = [job.animation]
+    container.x, container.y = job.origin or (job.canvas[0] // 2, job.canvas[1] // 2)
+    target = headless.new_target(job.canvas)
+    paths = []
+    for frame in range(job.start, job.stop):
+        # Every frame starts from the bind pose, so the output does not depend
+        # on which frames this worker happened to render before
+        container.skeleton.set_to_bind_pose()
+        headless.render(container, job.canvas, frame / job.fps, True, 1, (0, 0, 0, 0), target)
+        path = frame_path(job.out, job.name, job.skin, job.animation, frame)
+        path.parent.mkdir(parents = True, exist_ok = True)
+        pygame.image.save(target, str(path))
+        paths.append(str(path))
+    return paths
+
+def jobs_for(dir, name, out, animations = None, skins = None, fps = 30, canvas = (1024, 1024), origin = None, chunk = 16):
+    from . import utils
+    data = utils.autoload(dir, name).data
+    animations = animations or [animation.name for animation in data.animations]
+    skins = skins or [None]
+    jobs = []
+    for skin in skins:
+        for animation_name in animations:
+            animation = data.find_animation(animation_name)
+            count = max(1, int(math.ceil(animation.duration * fps)))
+            # Chunks keep every worker busy even when one animation is much
+            # longer than the others
+            for start in range(0, count, chunk):
+                jobs.append(Job(dir, name, skin, animation_name, start, min(start + chunk, count), fps, tuple(canvas), origin, str(out)))
+    return jobs
+
+def run(jobs, workers = None, progress = None):
+    workers = workers or os.cpu_count() or 1
+    total = sum(job.stop - job.start for job in jobs)
+    done = 0
+    paths = []
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = {executor.submit(render_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            job_paths = future.result()
+            paths.extend(job_paths)
+            done += len(job_paths)
+            if progress is not None:
+                progress(done, total, futures[future])
+    return sorted(paths)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Export spine3 animations to PNG frame sequences')
+    parser.add_argument('dir')
+    parser.add_argument('name')
+    parser.add_argument('--animations', nargs = '*', default = None)
+    parser.add_argument('--skins', nargs = '*', default = None)
+    parser.add_argument('--fps', type = int, default = 30)
+    parser.add_argument('--canvas', type = int, nargs = 2, default = (1024, 1024))
+    parser.add_argument('--chunk', type = int, default = 16)
+    parser.add_argument('--workers', type = int, default = None)
+    parser.add_argument('--out', default = 'frames')
+    args = parser.parse_args()
+
+    jobs = jobs_for(args.dir, args.name, args.out, args.animations, args.skins, args.fps, args.canvas, chunk = args.chunk)
+
+    def progress(done, total, job):
+        sys.stderr.write('\r%d/%d frames' % (done, total))
+        sys.stderr.flush()
+
+    paths = run(jobs, args.workers, progress)
+    sys.stderr.write('\n')
+    print('%d frames -> %s' % (len(paths), args.out))
+
+if __name__ == '__main__':
+    main()
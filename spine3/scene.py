@@ -0,0 +1,99 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None
+_workers = None
+
+def free_threaded():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+def parallel_poses(containers):
+    # Threads only run poses side by side without the GIL, timelines and
+    # bone math are python so with the GIL poses run serially
+    return free_threaded()
+
+def default_executor():
+    global _executor, _workers
+    if _executor is None:
+        _workers = os.cpu_count() or 1
+        _executor = ThreadPoolExecutor(max_workers = _workers, thread_name_prefix = 'spine3-pose')
+    return _executor
+
+def _pose(containers, times, loop, weight):
+    for container, time in zip(containers, times):
+        container.pose(container.active_animation_names[0], time, loop, weight)
+
+def update_all(containers, time, loop = True, weight = 1, executor = None, parallel = None, workers = None):
+    # workers is the size of a given executor, os.cpu_count() when unknown
+    # time is either shared by every container or one value per container
+    containers = list(containers)
+    times = list(time) if isinstance(time, (list, tuple)) else [time] * len(containers)
+    if parallel is None:
+        parallel = parallel_poses(containers)
+    if not parallel or len(containers) < 2:
+        _pose(containers, times, loop, weight)
+        return
+    if executor is None:
+        executor = default_executor()
+        workers = _workers
+    # One chunk per worker keeps the per task overhead out of the frame time
+    chunks = max(1, min(len(containers), workers or os.cpu_count() or 1))
+    futures = [
+        executor.submit(_pose, containers[i::chunks], times[i::chunks], loop, weight)
+            for i in range(chunks)
+    ]
+    for future in futures:
+        future.result()
+
+def draw_all(containers, surface):
+    # Poses are evaluated by update_all, drawing stays on the calling thread
+    for container in containers:
+        container.skeleton.draw(surface)
+
+def render_all(containers, surface, time, loop = True, weight = 1, executor = None, parallel = None, workers = None):
+    update_all(containers, time, loop, weight, executor, parallel, workers)
+    draw_all(containers, surface)
+
+def merge_rects(rects):
+    # Unions overlapping rects until none overlap, fewer and larger rects are
+    # cheaper to clear and to hand to pygame.display.update
+    merged = []
+    for rect in rects:
+        if rect is None:
+            continue
+        rect = rect.copy()
+        i = 0
+        while i < len(merged):
+            if rect.colliderect(merged[i]):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+def clear_rects(surface, background, rects):
+    # background is either a surface the size of the target or a fill color
+    import pygame
+    for rect in rects:
+        if isinstance(background, pygame.Surface):
+            surface.blit(background, rect, rect)
+        else:
+            surface.fill(background, rect)
+
+def render_dirty(containers, surface, background, time, loop = True, weight = 1, executor = None, parallel = None, workers = None, update_display = True):
+    # Clears what the containers covered last frame, draws them and refreshes
+    # only the areas that changed. Returns the refreshed rects
+    import pygame
+    update_all(containers, time, loop, weight, executor, parallel, workers)
+    clear_rects(surface, background, merge_rects(
+        container.skeleton.last_drawn_rect for container in containers
+    ))
+    rects = merge_rects(
+        container.skeleton.draw(surface, dirty = True) for container in containers
+    )
+    if update_display:
+        pygame.display.update(rects)
+    return rects
@@ -2,7 +2,6 @@ import math
 import json
 import typing
 import pygame
-from functools import cache
 
 from .bone import Bone
 from .slots import Slot
@@ -10,6 +9,9 @@ from . import slots
 from . import skin
 from . import bone
 from . import animation 
+from . import caches
+from . import indexing
+from . import lod
 
 class SkeletonData:
     def __init__(self):
@@ -18,45 +20,109 @@ class SkeletonData:
         self.skins = []
         self.animations = []
         self.default_skin = None
+        # None means the process wide caches.default_transform_cache
+        self.transform_cache = None
+        # Opt in caches.PoseCache shared by every skeleton built on this data
+        self.pose_cache = None
+        self._bone_index = indexing.NameIndex()
+        self._slot_index = indexing.NameIndex()
+        self._skin_index = indexing.NameIndex()
+        self._animation_index = indexing.NameIndex()
 
     def find_bone(self, bone_name) -> Bone:
-        for i, bone in enumerate(self.bones):
-            if bone.name == bone_name:
-                return bone
-        raise ValueError("Unknown bone: %s" % bone_name)
+        return self.bones[self.find_bone_index(bone_name)]
 
     def find_bone_index(self, bone_name) -> int:
-        for i, bone in enumerate(self.bones):
-            if bone.name == bone_name:
-                return i
-        raise ValueError("Unknown bone: %s" % bone_name)
+        i = self._bone_index.find(self.bones, bone_name)
+        if i < 0:
+            raise ValueError("Unknown bone: %s" % bone_name)
+        return i
 
     def find_slot(self, slot_name) -> Slot:
-        for i, slot in enumerate(self.slots):
-            if slot.name == slot_name:
-                return slot
-        raise ValueError("Unknown slot: %s" % slot_name)
+        return self.slots[self.find_slot_index(slot_name)]
 
     def find_slot_index(self, slot_name) -> int:
-        for i, slot in enumerate(self.slots):
-            if slot.name == slot_name:
-                return i
-        raise ValueError("Unknown slot: %s" % slot_name)
+        i = self._slot_index.find(self.slots, slot_name)
+        if i < 0:
+            raise ValueError("Unknown slot: %s" % slot_name)
+        return i
 
     def find_skin(self, skinName) -> skin.Skin:
-        for i, skin in enumerate(self.skins):
-            if skin.name == skinName:
-                return skin
-        raise ValueError("Unknown skin: %s" % skinName)
+        i = self._skin_index.find(self.skins, skinName)
+        if i < 0:
+            raise ValueError("Unknown skin: %s" % skinName)
+        return self.skins[i]
+
+    def find_animation_index(self, animation_name) -> int:
+        i = self._animation_index.find(self.animations, animation_name)
+        if i < 0:
+            raise ValueError("Unknown animation: %s" % animation_name)
+        return i
 
     def find_animation(self, animation_name) -> animation.Animation:
-        for i, animation in enumerate(self.animations):
-            if animation.name == animation_name:
-                return animation
-        raise ValueError("Unknown animation: %s" % animation_name)
+        return self.animations[self.find_animation_index(animation_name)]
+
+    def pages_for(self, skin_names):
+        return {
+            attachment.region.page 
+                for skin_name in skin_names 
+                    for attachment in self.find_skin(skin_name).attachments.values()
+        }
+
+    def preload_skins(self, skin_names):
+        for page in self.pages_for(skin_names):
+            page.load()
+
+    def unload_unused_pages(self, skin_names):
+        # Keeps the pages referenced by skin_names and the default skin
+        used = self.pages_for(list(skin_names) + ([self.default_skin.name] if self.default_skin else []))
+        for page in self.pages_for(skin.name for skin in self.skins) - used:
+            page.unload()
+
+    @classmethod
+    def build_from(cls, root : dict, attachment_loader, scale = 1):
+        skeleton_data = cls()
+                
+        for bone_map in root.get('bones', []):
+            bone_data = bone.BoneData.build_from(bone_map, scale, skeleton_data)
+            skeleton_data.bones.append(bone_data)
+
+        for slot_map in root.get('slots', []):
+            slot_data = slots.SlotData.build_from(slot_map, skeleton_data)
+            skeleton_data.slots.append(slot_data)
+            
+        for (skin_name, slot_map) in root.get('skins', {}).items():
+            skin_spec = skin.Skin.build_from(
+                slot_map, 
+                skin_name, 
+                skeleton_data, 
+                scale, 
+                attachment_loader
+            )
+            skeleton_data.skins.append(skin_spec)
+
+        for (animation_name, animation_map) in root.get('animations', {}).items():
+            animation_data = animation.Animation.build_from(
+                name = animation_name, 
+                root = animation_map, 
+                skeleton_data = skeleton_data, 
+                scale = scale
+            )
+            skeleton_data.animations.append(animation_data)
+
+        return skeleton_data
+
+def _union(bounds):
+    return (
+        min(b[0] for b in bounds), min(b[1] for b in bounds),
+        max(b[2] for b in bounds), max(b[3] for b in bounds)
+    )
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
 
 class Skeleton:
-    def __init__(self, skeleton_data : SkeletonData, rotation_accuracy = 1):
+    def __init__(self, skeleton_data : SkeletonData, rotation_accuracy = 1, rotation_steps = None):
         self.data = skeleton_data
         self.skin = None
         self.x = 0
@@ -65,6 +131,29 @@ class Skeleton:
         self.flip_x = False
         self.flip_y = False
         self.rotation_accuracy = rotation_accuracy
+        # Last keyframe index seen by each timeline, see InterpolableTimeline.find_frame
+        self.timeline_cursors = {}
+        # Angle resolution used with attachments baked into rotation sheets,
+        # None uses every step baked by the AttachmentLoader
+        self.rotation_steps = rotation_steps
+        # Bumped by every update_world_transform, see Bone.changed_at
+        self.world_version = 0
+        self._world_flip = None
+        # Level of detail, off while lod_levels is None. lod_level forces a
+        # level, otherwise one is picked from screen_scale, where lod_scale is
+        # the caller's zoom or distance factor
+        self.lod_levels = None
+        self.lod_level = None
+        self.lod_scale = 1.0
+        # With culling on, draw skips the skeleton or single slots whose bounds,
+        # grown by cull_margin pixels, miss the target's clip rect
+        self.culling = False
+        self.cull_margin = 2
+        self.cull_counters = {'skeletons_culled': 0, 'slots_culled': 0, 'slots_drawn': 0}
+        # Union of the rects blitted by the last draw(dirty = True)
+        self.last_drawn_rect = None
+        # Optional object drawing in place of the blit path, see affine.AffineRenderer
+        self.renderer = None
 
         self.bones : list[Bone] = self._build_bones(self.data.bones)
         self.slots = self._build_slots(self.data.slots, self.data.bones)
@@ -77,13 +166,11 @@ class Skeleton:
         ]
 
     def _build_slots(self, slots_data, bones_data):
+        bone_indices = {id(bone_data): i for (i, bone_data) in enumerate(bones_data)}
         to_r = []
         for slot_data in slots_data:
-            bone = next(
-                self.bones[i] # get the bone who's data matches 
-                    for (i, bone) in enumerate(bones_data)
-                        if slot_data.bone_data == bone # the one contained in the slot
-            )
+            # the bone who's data matches the one contained in the slot
+            bone = self.bones[bone_indices[id(slot_data.bone_data)]]
             slot = Slot(slot_data=slot_data, skeleton=self, bone=bone)
             to_r.append(slot)
         return to_r
@@ -97,38 +184,130 @@ class Skeleton:
             (bone, bone_data) for (bone, bone_data) in zip(to_r, bones_data)
                 if bone_data.parent
         )
+        bone_indices = {id(bone_data): i for (i, bone_data) in enumerate(bones_data)}
         for (bone, bone_data) in to_pair:
-            index = next( # get the index of the first candidate 
-                i for (i, candidate_parent) in enumerate(bones_data) 
-                    if candidate_parent == bone_data.parent # that is our parent
-            )
-            bone.parent = to_r[index]
+            bone.parent = to_r[bone_indices[id(bone_data.parent)]]
         return to_r
     
-    @cache
-    @staticmethod
-    def _rotate(texture, angle):
-        return pygame.transform.rotate(texture, -angle)
-
-    @cache
-    @staticmethod
-    def _scale(texture, scale_x, scale_y):
-        return pygame.transform.scale(texture, (scale_x, scale_y))
-
-    def _accurate(self, i, accuracy):
-        return int(i * accuracy) / accuracy
-    
-    def draw(self, screen):
+    @property
+    def transform_cache(self) -> caches.TransformCache:
+        if self.data.transform_cache is not None:
+            return self.data.transform_cache
+        return caches.default_transform_cache
+
+    @property
+    def screen_scale(self):
+        if not self.bones:
+            return self.lod_scale
+        root = self.bones[0]
+        return self.lod_scale * math.sqrt(math.fabs(root.world_scale_x * root.world_scale_y))
+
+    def current_lod(self):
+        if self.lod_level is not None:
+            return self.lod_level
+        if self.lod_levels is None:
+            return None
+        return lod.select(self.lod_levels, self.screen_scale)
+
+    def get_slot_bounds(self, slot):
+        # Screen space (left, top, right, bottom) of the slot as draw blits it,
+        # the rotated texture scaled along the screen axes. With the python
+        # backend it is kept relative to the skeleton until the bone changes
+        cached = slot.bounds
+        attachment = slot.attachment
+        if (
+            cached is None 
+                or cached[1] is not attachment or cached[0] < slot.bone.changed_at
+        ):
+            bone = slot.bone
+            # The transform cache rounds scales, grow by half of its step
+            slack = 0.5 / self.transform_cache.scale_accuracy
+            width, height = attachment.rect.size
+            radians = math.radians(bone.world_rotation + attachment.rotation)
+            cos = math.fabs(math.cos(radians))
+            sin = math.fabs(math.sin(radians))
+            half_x = (width * cos + height * sin) / 2 * (math.fabs(bone.world_scale_x + attachment.scale_x - 1) + slack)
+            half_y = (width * sin + height * cos) / 2 * (math.fabs(bone.world_scale_y + attachment.scale_y - 1) + slack)
+            x = bone.world_x + attachment.x * bone.m00 + attachment.y * bone.m01
+            y = -(bone.world_y + attachment.x * bone.m10 + attachment.y * bone.m11)
+            cached = slot.bounds = (self.world_version, attachment, (x - half_x, y - half_y, x + half_x, y + half_y))
+        left, top, right, bottom = cached[2]
+        return (self.x + left, self.y + top, self.x + right, self.y + bottom)
+
+    def get_bounds(self):
+        # Screen space pygame.Rect around every drawn attachment, None if empty
+        bounds = [self.get_slot_bounds(slot) for slot in self.ordered_drawables if slot.attachment]
+        if not bounds:
+            return None
+        left, top, right, bottom = _union(bounds)
+        return pygame.Rect(
+            math.floor(left), math.floor(top),
+            math.ceil(right) - math.floor(left), math.ceil(bottom) - math.floor(top)
+        )
+
+    def reset_cull_counters(self):
+        for key in self.cull_counters:
+            self.cull_counters[key] = 0
+
+    def _dirty_rect(self, rects):
+        # Area to refresh: this frame's blits plus what the last frame covered
+        # Blits outside the target come back clipped to empty rects on its edge
+        rects = [rect for rect in rects if rect.width and rect.height]
+        drawn = rects[0].unionall(rects[1:]) if rects else None
+        previous = self.last_drawn_rect
+        self.last_drawn_rect = drawn
+        if previous is None:
+            return drawn
+        if drawn is None:
+            return previous
+        return drawn.union(previous)
+
+    def draw(self, screen, dirty = False):
         import pygame
+        if self.renderer is not None:
+            return self.renderer.draw(self, screen, dirty)
+        transform_cache = self.transform_cache
         to_draw = []
-        for slot in self.ordered_drawables:
+        version = self.world_version
+        rotation_accuracy = self.rotation_accuracy
+        min_area = 0
+        level = self.current_lod()
+        if level is not None:
+            min_area = level.min_area
+            if level.rotation_accuracy:
+                rotation_accuracy = level.rotation_accuracy
+        counters = self.cull_counters
+        culling = self.culling
+        # Timelines may have cleared an attachment since ordered_drawables was built
+        drawables = [slot for slot in self.ordered_drawables if slot.attachment is not None]
+        if culling:
+            clip = screen.get_clip()
+            margin = self.cull_margin
+            view = (clip.left - margin, clip.top - margin, clip.right + margin, clip.bottom + margin)
+            slot_bounds = [self.get_slot_bounds(slot) for slot in drawables]
+            if not slot_bounds or not _overlaps(_union(slot_bounds), view):
+                counters['skeletons_culled'] += 1
+                counters['slots_culled'] += len(slot_bounds)
+                return self._dirty_rect([]) if dirty else None
+        # Draw parameters are reused until Bone.changed_at tells the slot's
+        # bone moved
+        for i, slot in enumerate(drawables):
+            if culling and not _overlaps(slot_bounds[i], view):
+                counters['slots_culled'] += 1
+                continue
+            params_key = (slot.attachment, self.flip_x, self.flip_y, rotation_accuracy, self.rotation_steps, min_area)
+            cached = slot.draw_params
+            if cached is not None and cached[1] == params_key and slot.bone.changed_at <= cached[0]:
+                if cached[2] is None:
+                    continue
+                texture, x, y = cached[2]
+                to_draw.append((texture, (self.x + x, self.y + y)))
+                continue
+
             local_x = slot.attachment.x * slot.bone.m00 + slot.attachment.y * slot.bone.m01
             local_y = slot.attachment.x * slot.bone.m10 + slot.attachment.y * slot.bone.m11
 
-            rotation = self._accurate(
-                -(slot.bone.world_rotation + slot.attachment.rotation),
-                self.rotation_accuracy
-            )
+            rotation = -(slot.bone.world_rotation + slot.attachment.rotation)
 
             x_scale = slot.bone.world_scale_x + slot.attachment.scale_x - 1
             y_scale = slot.bone.world_scale_y + slot.attachment.scale_y - 1
@@ -149,37 +328,60 @@ class Skeleton:
             if y_scale < 0:
                 flip_y = True
                 y_scale = math.fabs(y_scale)
-            
-            texture : pygame.Surface = slot.attachment.texture
 
-            if rotation != 0:
-                texture = Skeleton._rotate(
-                    texture, 
-                    rotation
+            if min_area:
+                # Areas are compared in final on-screen pixels
+                width, height = slot.attachment.texture.get_size()
+                if width * height * x_scale * y_scale * self.lod_scale ** 2 < min_area:
+                    slot.draw_params = (version, params_key, None)
+                    continue
+
+            if slot.attachment.rotation_sheet:
+                texture : pygame.Surface = transform_cache.transform(
+                    slot.attachment.rotated(rotation, self.rotation_steps),
+                    0,
+                    x_scale,
+                    y_scale
+                )
+            else:
+                texture : pygame.Surface = transform_cache.transform(
+                    slot.attachment.texture,
+                    rotation,
+                    x_scale,
+                    y_scale,
+                    rotation_accuracy
                 )
-            
-            old_scale = texture.get_size()
-            scale_x, scale_y =  (
-                int(old_scale[0] * x_scale), 
-                int(old_scale[1] * y_scale)
-            )
-            texture = Skeleton._scale(texture, scale_x, scale_y)
 
             if flip_x or flip_y:
                 texture = pygame.transform.flip(texture, flip_x, flip_y)
                 
             # Center image
             cx, cy = texture.get_rect().center
-            x = self.x + slot.bone.world_x + local_x
-            y = self.y - (slot.bone.world_y + local_y)
-            x -= cx
-            y -= cy
-            to_draw.append((texture, (x, y)))
-        screen.blits(to_draw)
+            x = slot.bone.world_x + local_x - cx
+            y = -(slot.bone.world_y + local_y) - cy
+            slot.draw_params = (version, params_key, (texture, x, y))
+            to_draw.append((texture, (self.x + x, self.y + y)))
+        counters['slots_drawn'] += len(to_draw)
+        if dirty:
+            return self._dirty_rect(screen.blits(to_draw))
+        screen.blits(to_draw, False)
 
     def update_world_transform(self):
+        self.world_version += 1
+        version = self.world_version
+        flip = (self.flip_x, self.flip_y)
+        force = flip != self._world_flip
+        self._world_flip = flip
+        # A bone is recomputed when its local transform differs from the one
+        # last applied, whoever wrote it. Parents come before their children,
+        # so a moved parent is already known
         for bone in self.bones:
-            bone.update_world_transform(self.flip_x, self.flip_y)
+            parent = bone.parent
+            local = (bone.x, bone.y, bone.rotation, bone.scale_x, bone.scale_y)
+            if force or local != bone.applied or (parent is not None and parent.changed_at == version):
+                bone.update_world_transform(*flip)
+                bone.applied = local
+                bone.changed_at = version
 
     def set_to_bind_pose(self):
         self.set_bones_to_bind_pose()
@@ -192,6 +394,7 @@ class Skeleton:
     def set_slots_to_bind_pose(self):
         for i, slot in enumerate(self.slots):
             slot.set_to_bind_pose_with_index(i)
+        self.ordered_drawables = self.get_ordered_drawables()
 
     def get_root_bone(self):
         return self.bones[0]
@@ -201,30 +404,25 @@ class Skeleton:
             self.bones[0] = bone
     
     def find_bone(self, bone_name):
-        for i, bone in enumerate(self.bones):
-            if self.data.bones[i].name == bone_name:
-                return self.bones[i]
-        return None
+        i = self.find_bone_index(bone_name)
+        return self.bones[i] if i >= 0 else None
 
     def find_bone_index(self, bone_name):
-        for i, bone in enumerate(self.bones):
-            if self.data.bones[i].name == bone_name:
-                return i
-        return -1
+        return self.data._bone_index.find(self.data.bones, bone_name)
 
     def find_slot(self, slot_name):
-        for i, slot in enumerate(self.slots):
-            if self.data.slots[i].name == slot_name:
-                return self.slots[i]
-        return None
+        i = self.find_slot_index(slot_name)
+        return self.slots[i] if i >= 0 else None
 
     def find_slot_index(self, slot_name):
-        for i, slot in enumerate(self.slots):
-            if self.data.slots[i].name == slot_name:
-                return i
-        return -1
+        return self.data._slot_index.find(self.data.slots, slot_name)
 
     def set_skin(self, skinName):
+        if skinName is None:
+            # Back to the attachments of the default skin
+            self.skin = None
+            self.set_slots_to_bind_pose()
+            return
         skin = self.data.find_skin(skinName)
         if not skin:
             raise Exception('Skin not found: %s' % skinName)
@@ -248,50 +446,26 @@ class Skeleton:
         return None
 
     def set_attachment(self, slot_name, attachment_name):
-        for i in range(len(self.slots)):
-            if self.slots[i].data.name == slot_name:
-                self.slots[i].set_attachment(self.get_attachment_by_index(i, attachment_name))
-                return
-        raise Exception('Slot not found: %s' % slot_name)
+        slot_index = self.find_slot_index(slot_name)
+        if slot_index < 0:
+            raise Exception('Slot not found: %s' % slot_name)
+        self.set_attachment_by_index(slot_index, attachment_name)
+
+    def set_attachment_by_index(self, slot_index, attachment_name):
+        self.slots[slot_index].set_attachment(self.get_attachment_by_index(slot_index, attachment_name))
 
     def update(self, delta):
         self.time += delta
     
     @classmethod
-    def parse(cls, desc : typing.TextIO | str, attachment_loader, scale = 1):
+    def parse(cls, desc : typing.TextIO | str, attachment_loader, scale = 1, **options):
         try:
             root = json.loads(desc) 
         except TypeError:
             root = json.load(desc)
-        skeleton_data = SkeletonData()
-                
-        for bone_map in root.get('bones', []):
-            bone_data = bone.BoneData.build_from(bone_map, scale, skeleton_data)
-            skeleton_data.bones.append(bone_data)
-
-        for slot_map in root.get('slots', []):
-            slot_data = slots.SlotData.build_from(slot_map, skeleton_data)
-            skeleton_data.slots.append(slot_data)
-            
-        for (skin_name, slot_map) in root.get('skins', {}).items():
-            skin_spec = skin.Skin.build_from(
-                slot_map, 
-                skin_name, 
-                skeleton_data, 
-                scale, 
-                attachment_loader
-            )
-            skeleton_data.skins.append(skin_spec)
+        return cls(SkeletonData.build_from(root, attachment_loader, scale), **options)
 
-        for (animation_name, animation_map) in root.get('animations', {}).items():
-            animation_data = animation.Animation.build_from(
-                name = animation_name, 
-                root = animation_map, 
-                skeleton_data = skeleton_data, 
-                scale = scale
-            )
-            skeleton_data.animations.append(animation_data)
-
-        return cls(skeleton_data)
-
-    
+    @classmethod
+    def load(cls, path, attachment_loader, scale = 1, **options):
+        from . import binary
+        return cls(binary.load_or_parse(path, attachment_loader, scale), **options)
@@ -13,7 +13,7 @@ class Skin:
 
     def get_attachment(self, slot_index, name):
         key = Key(slot_index=slot_index, name=name)
-        return self.attachments[key]
+        return self.attachments.get(key)
         
     def attach_all(self, skeleton):
         for key, attachment in self.attachments.items():
@@ -34,6 +34,10 @@ class Slot:
         self.color = self.data.color
         self.attachment = None
         self.attachment_time = 0.0
+        # (world version, key, (texture, x, y)) from the last Skeleton.draw
+        self.draw_params = None
+        # (world version, attachment, bounds) from Skeleton.get_slot_bounds
+        self.bounds = None
         self.set_to_bind_pose()
                           
     def set_attachment(self, attachment):
@@ -41,9 +45,7 @@ class Slot:
         self.attachment_time = self.skeleton.time
     
     def set_to_bind_pose(self):
-        for i, slot in enumerate(self.skeleton.data.slots):
-            if self.data == slot:
-                self.set_to_bind_pose_with_index(i)
+        self.set_to_bind_pose_with_index(self.skeleton.data.find_slot_index(self.data.name))
 
     def set_to_bind_pose_with_index(self, slotIndex):
         self.color = self.data.color
@@ -0,0 +1,93 @@
+import argparse
+import json
+import math
+from pathlib import Path
+
+import pygame
+
+from . import headless
+
+def render_frames(container, animation_name, fps = 30, skin = None, canvas = (1024, 1024), origin = None, loop = True):
+    if skin:
+        container.skin = skin
+    container.active_animation_names = [animation_name]
+    duration = container.active_animations[animation_name].duration
+    origin = origin or (canvas[0] // 2, canvas[1] // 2)
+    old_position = (container.x, container.y)
+    container.x, container.y = origin
+    frames = []
+    try:
+        for i in range(max(1, int(math.ceil(duration * fps)))):
+            surface = headless.render(container, canvas, i / fps, loop)
+            rect = surface.get_bounding_rect()
+            anchor = (origin[0] - rect.x, origin[1] - rect.y)
+            frames.append((surface.subsurface(rect).copy(), anchor))
+    finally:
+        container.x, container.y = old_position
+    return frames, duration
+
+def pack(frames, max_width = 2048, padding = 1):
+    # Shelf packing, frames are laid left to right and wrap into a new row
+    rects = []
+    x = y = shelf_height = width = 0
+    for frame, _ in frames:
+        w, h = frame.get_size()
+        if x and x + w > max_width:
+            x = 0
+            y += shelf_height + padding
+            shelf_height = 0
+        rects.append(pygame.Rect(x, y, w, h))
+        x += w + padding
+        shelf_height = max(shelf_height, h)
+        width = max(width, x - padding)
+    sheet = headless.new_target((max(width, 1), max(y + shelf_height, 1)))
+    for rect, (frame, _) in zip(rects, frames):
+        sheet.blit(frame, rect, special_flags = pygame.BLEND_RGBA_MAX)
+    return sheet, rects
+
+def bake(container, animation_name, fps = 30, skin = None, canvas = (1024, 1024), origin = None, loop = True, max_width = 2048):
+    frames, duration = render_frames(container, animation_name, fps, skin, canvas, origin, loop)
+    sheet, rects = pack(frames, max_width)
+    manifest = {
+        'animation': animation_name,
+        'skin': skin,
+        'fps': fps,
+        'duration': duration,
+        'frames': [
+            {'rect': list(rect), 'anchor': list(anchor)}
+                for (rect, (_, anchor)) in zip(rects, frames)
+        ]
+    }
+    return sheet, manifest
+
+def save(sheet, manifest, path):
+    path = Path(path)
+    pygame.image.save(sheet, str(path.with_suffix('.png')))
+    path.with_suffix('.json').write_text(json.dumps(manifest, indent=1))
+
+def load(path):
+    path = Path(path)
+    sheet = headless.convert_texture(pygame.image.load(str(path.with_suffix('.png'))))
+    manifest = json.loads(path.with_suffix('.json').read_text())
+    return sheet, manifest
+
+def main():
+    from . import utils
+    parser = argparse.ArgumentParser(description = 'Bake a spine3 animation into a sprite sheet')
+    parser.add_argument('dir')
+    parser.add_argument('name')
+    parser.add_argument('animation')
+    parser.add_argument('--skin', default = None)
+    parser.add_argument('--fps', type = int, default = 30)
+    parser.add_argument('--canvas', type = int, nargs = 2, default = (1024, 1024))
+    parser.add_argument('--out', default = None)
+    args = parser.parse_args()
+
+    container = utils.autoload_container(args.dir, args.name)
+    sheet, manifest = bake(container, args.animation, args.fps, args.skin, tuple(args.canvas))
+    out = args.out or '%s_%s' % (args.name, args.animation)
+    save(sheet, manifest, out)
+    print('%d frames, sheet %dx%d -> %s' % (len(manifest['frames']), *sheet.get_size(), Path(out).with_suffix('.png')))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import weakref
+from pathlib import Path
+
+MAGIC = b'SPT3'
+VERSION = 1
+SUFFIX = '.rgba'
+# magic, version, pixel format, width, height
+HEADER = struct.Struct('<4sH4sII')
+
+# Off unless SPINE3_TEXTURE_CACHE names a directory or this is set to True.
+# Files are never evicted, clear() empties the cache
+enabled = bool(os.environ.get('SPINE3_TEXTURE_CACHE'))
+# Where decoded pages are kept, None picks SPINE3_TEXTURE_CACHE or the user
+# cache directory
+directory = None
+
+# Keeps each mapping open as long as a surface wraps it
+_mappings = weakref.WeakKeyDictionary()
+
+def cache_dir():
+    if directory is not None:
+        return Path(directory)
+    path = os.environ.get('SPINE3_TEXTURE_CACHE')
+    if path:
+        return Path(path)
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'spine3' / 'textures'
+
+def cache_path(source):
+    # Pages are told apart by content, the same image shipped by several rigs
+    # or renamed maps to the same file
+    from .headless import PIXEL_FORMAT
+    digest = hashlib.sha1(source)
+    digest.update(PIXEL_FORMAT.encode())
+    return cache_dir() / (digest.hexdigest() + SUFFIX)
+
+def _map(path):
+    # Copy on write mapping, pages stay shared with every other process
+    # mapping the same file until a surface writes to them
+    from .headless import PIXEL_FORMAT
+    import pygame
+    with open(path, 'rb') as fh:
+        mapping = mmap.mmap(fh.fileno(), 0, access = mmap.ACCESS_COPY)
+    if len(mapping) < HEADER.size:
+        mapping.close()
+        return None
+    magic, version, pixel_format, width, height = HEADER.unpack_from(mapping)
+    if (magic != MAGIC or version != VERSION or pixel_format != PIXEL_FORMAT.encode()
+            or len(mapping) != HEADER.size + width * height * 4):
+        mapping.close()
+        return None
+    pixels = memoryview(mapping)[HEADER.size:]
+    surface = pygame.image.frombuffer(pixels, (width, height), PIXEL_FORMAT)
+    _mappings[surface] = (mapping, pixels)
+    return surface
+
+def _write(path, surface):
+    from .headless import PIXEL_FORMAT
+    import pygame
+    width, height = surface.get_size()
+    path.parent.mkdir(parents = True, exist_ok = True)
+    # Written aside and renamed, a process never maps a half written page
+    fd, temp = tempfile.mkstemp(dir = path.parent, suffix = '.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(HEADER.pack(MAGIC, VERSION, PIXEL_FORMAT.encode(), width, height))
+            fh.write(pygame.image.tobytes(surface, PIXEL_FORMAT))
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+def load(path):
+    import io
+    import pygame
+    from . import headless
+    path = Path(path)
+    if not enabled:
+        return headless.convert_texture(pygame.image.load(path))
+    source = path.read_bytes()
+    cached = cache_path(source)
+    try:
+        surface = _map(cached)
+        if surface is not None:
+            return surface
+    except (OSError, ValueError):
+        pass
+    surface = headless.convert_texture(pygame.image.load(io.BytesIO(source), path.name))
+    try:
+        _write(cached, surface)
+    except OSError:
+        # A read only cache only costs the decode
+        pass
+    return surface
+
+def clear():
+    # Removes every cached page, returns the number of files removed
+    removed = 0
+    for path in cache_dir().glob('*' + SUFFIX):
+        try:
+            path.unlink()
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -1,4 +1,8 @@
 import bisect
+import copy
+import math
+import sys
+from array import array
 
 def binary_search(values, target):
     return bisect.bisect_left(values, target, key=lambda x: x.time)
@@ -10,8 +14,9 @@ class SoonError(Exception): pass
 
 class BezierCurveData:
     BEZIER_SEGMENTS = 10.0
-    def __init__(self, curve = []):
+    def __init__(self, curve = [], points = None):
         self.curve = [0 for _ in range(6 - len(curve))] +  curve
+        self.points = points
     @classmethod
     def from_points(cls, cx1, cy1, cx2, cy2):
         subdiv_step = 1.0 / cls.BEZIER_SEGMENTS
@@ -33,7 +38,8 @@ class BezierCurveData:
                 tmp1y * pre4 + tmp2y * pre5,
                 tmp2x * pre5,
                 tmp2y * pre5
-            ]
+            ],
+            (cx1, cy1, cx2, cy2)
         )
 
     def interpolate(self, percent):
@@ -63,7 +69,76 @@ class LinearCurveData:
 
 class SteppedCurveData: 
     def interpolate(self, _): return 0
+
+LINEAR = LinearCurveData()
+STEPPED = SteppedCurveData()
+
+class CurveTable:
+    # Every curve is stored as SAMPLES + 1 values of y at evenly spaced x,
+    # evaluating one is a lookup and a lerp whatever its kind
+    SAMPLES = 64
+    LINEAR = 0
+    STEPPED = 1
+    BEZIER = 2
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.values = array('d')
+        self._rows = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def nbytes(self):
+        return self.values.itemsize * len(self.values) + len(self.kinds)
+
+    @classmethod
+    def from_arrays(cls, kinds, values):
+        to_r = cls()
+        to_r.kinds = kinds
+        to_r.values = values
+        return to_r
+
+    def add(self, curve):
+        if isinstance(curve, BezierCurveData):
+            key = (self.BEZIER, tuple(curve.curve))
+        elif isinstance(curve, SteppedCurveData):
+            key = (self.STEPPED, )
+        else:
+            key = (self.LINEAR, )
+        if key not in self._rows:
+            self._rows[key] = len(self.kinds)
+            self.kinds.append(key[0])
+            if key[0] == self.LINEAR:
+                self.values.extend(_LINEAR_ROW)
+            elif key[0] == self.STEPPED:
+                self.values.extend(_STEPPED_ROW)
+            else:
+                self.values.extend(curve.interpolate(k / self.SAMPLES) for k in range(self.SAMPLES + 1))
+        return self._rows[key]
+
+    def evaluate(self, row, percent):
+        position = percent * self.SAMPLES
+        k = int(position)
+        base = row * (self.SAMPLES + 1) + k
+        if k >= self.SAMPLES:
+            return self.values[base - k + self.SAMPLES]
+        y = self.values[base]
+        return y + (self.values[base + 1] - y) * (position - k)
+
+    def evaluate_many(self, rows, percents):
+        import numpy as np
+        table = np.frombuffer(self.values, dtype=float).reshape(-1, self.SAMPLES + 1)
+        rows = np.asarray(rows, dtype=np.intp)
+        position = np.clip(np.asarray(percents, dtype=float), 0, 1) * self.SAMPLES
+        k = np.minimum(position.astype(np.intp), self.SAMPLES - 1)
+        y = table[rows, k]
+        return y + (table[rows, k + 1] - y) * (position - k)
     
+_LINEAR_ROW = array('d', (k / CurveTable.SAMPLES for k in range(CurveTable.SAMPLES + 1)))
+_STEPPED_ROW = array('d', bytes(8 * (CurveTable.SAMPLES + 1)))
+
 class InterpolableKeyframe:
     class ScalarCouple:
         def __init__(self, iterator):
@@ -124,7 +199,107 @@ class InterpolableKeyframe:
         act_percent = last_frame.curve.interpolate(lin_percent)
         return self.value.lin_interpolate(last_frame.value, act_percent)
 
+class BakedSamples:
+    def __init__(self, timeline, fps, blend):
+        self.fps = fps
+        self.start = timeline.start
+        self.duration = timeline.duration
+        self.angular = timeline.ANGULAR
+        self.last = timeline.keyframes[-1].value.naked_value
+
+        count = int(math.ceil(self.duration * fps)) + 1
+        values = [timeline.sample(i / fps) for i in range(count)]
+        if isinstance(self.last, (int, float)):
+            self.width = 1
+            self.values = array('d', values)
+        elif isinstance(self.last, (list, tuple)) and len(self.last) == 2:
+            self.width = 2
+            self.values = array('d', (c for value in values for c in value))
+        else:
+            # Attachment names and colors switch, they are never blended
+            self.width = 0
+            self.values = values
+            blend = False
+        self.blend = blend
+
+        # Sample intervals that contain the end of a stepped segment must not
+        # be blended, they map to the time at which the value jumps
+        self.steps = {}
+        if blend:
+            for i, frame in enumerate(timeline.keyframes[1:]):
+                if timeline.is_stepped(i):
+                    self.steps[int(frame.time * fps)] = frame.time
+
+    @property
+    def nbytes(self):
+        if isinstance(self.values, array):
+            return self.values.itemsize * len(self.values)
+        # The list and every distinct value it refers to
+        distinct = {id(value): value for value in self.values}
+        return sys.getsizeof(self.values) + sum(sys.getsizeof(value) for value in distinct.values())
+
+    def get_current(self, time, cursors = None):
+        if time <= self.start:
+            raise SoonError()
+        elif time >= self.duration:
+            return self.last
+
+        position = time * self.fps
+        if not self.blend:
+            # A sample holds until the next one, rounding would switch early.
+            # The epsilon keeps times landing on a sample from flooring below it
+            i = int(position + 1e-9)
+            if self.width == 2:
+                return self.values[2 * i], self.values[2 * i + 1]
+            return self.values[i]
+
+        i = int(position)
+        perc = position - i
+        if self.steps and i in self.steps:
+            perc = 0 if time < self.steps[i] else 1
+        values = self.values
+        if self.width == 2:
+            x1, y1, x2, y2 = values[2 * i: 2 * i + 4]
+            return x1 + (x2 - x1) * perc, y1 + (y2 - y1) * perc
+        v1 = values[i]
+        dt = values[i + 1] - v1
+        if self.angular:
+            dt = mod_m180_p180(dt)
+        return v1 + dt * perc
+
+    def get_many(self, times):
+        import numpy as np
+        times = np.asarray(times, dtype=float)
+        active = times > self.start
+        position = np.clip(times, 0, self.duration) * self.fps
+        if self.width == 0:
+            i = np.minimum((position + 1e-9).astype(np.intp), len(self.values) - 1)
+            values = np.empty(len(self.values), dtype=object)
+            values[:] = self.values
+            return values[i], active
+
+        values = np.frombuffer(self.values, dtype=float).reshape(-1, self.width)
+        if not self.blend:
+            i = np.minimum((position + 1e-9).astype(np.intp), len(values) - 1)
+            result = values[i]
+            return (result[:, 0] if self.width == 1 else result), active
+        i = np.minimum(position.astype(np.intp), len(values) - 2)
+        perc = np.clip(position - i, 0, 1)
+        for step_i, step_time in self.steps.items():
+            perc = np.where(i == step_i, times >= step_time, perc)
+        v1 = values[i]
+        dt = values[i + 1] - v1
+        if self.angular:
+            dt = mod_m180_p180(dt)
+        result = v1 + dt * perc[:, None]
+        if self.width == 1:
+            result = result[:, 0]
+        return result, active
+
 class InterpolableTimeline:
+    ANGULAR = False
+    baked = None
+
     def __init__(self):
         self.keyframes : list[InterpolableKeyframe] = [ ]
 
@@ -137,8 +312,7 @@ class InterpolableTimeline:
         return self.keyframes[0].time    
     
     def get_curve_percent(self, keyframe_index, percent):
-        curve = self.keyframes[keyframe_index].curve
-        return curve.interpolate(percent)
+        return self.curves.evaluate(self.curve_rows[keyframe_index], percent)
 
     def get_keyframes(self, keyframe_list):
         for keyframe in keyframe_list:
@@ -148,32 +322,70 @@ class InterpolableTimeline:
                 InterpolableKeyframe(keyframe["time"], curve, data)
             )
         self.keyframes.sort(key=lambda x:x.time)
-
-    def get_current(self, time):
+        self.compile_curves()
+
+    def compile_curves(self):
+        self.curves = CurveTable()
+        self.curve_rows = array('I', (self.curves.add(keyframe.curve) for keyframe in self.keyframes))
+
+    def is_stepped(self, keyframe_index):
+        return self.curves.kinds[self.curve_rows[keyframe_index]] == CurveTable.STEPPED
+
+    def find_frame(self, time, cursors = None):
+        # Index of the first keyframe at or after time. Cursors belong to the
+        # caller and map each timeline to the index found last time, during
+        # playback it is almost always still valid or just one step behind
+        keyframes = self.keyframes
+        if cursors is None:
+            return binary_search(keyframes, time)
+        frame_i = cursors.get(self, 1)
+        if not keyframes[frame_i - 1].time < time <= keyframes[frame_i].time:
+            frame_i += 1
+            if not (frame_i < len(keyframes) and keyframes[frame_i - 1].time < time <= keyframes[frame_i].time):
+                frame_i = binary_search(keyframes, time)
+        cursors[self] = frame_i
+        return frame_i
+
+    def get_current(self, time, cursors = None):
         if time <= self.start:
             raise SoonError()
         elif time >= self.duration:
             return self.keyframes[-1].value.naked_value
             
-        frame_i = binary_search(self.keyframes, time)
+        frame_i = self.find_frame(time, cursors)
         last_frame = self.keyframes[frame_i - 1]
         curr_frame = self.keyframes[frame_i]
         percent = 1 - (time - curr_frame.time) / (last_frame.time - curr_frame.time) 
         percent = min(max(percent, 0), 1)
-        return (curr_frame.interpolate(last_frame, percent))
+        percent = self.curves.evaluate(self.curve_rows[frame_i - 1], percent)
+        return curr_frame.value.lin_interpolate(last_frame.value, percent)
+
+    def sample(self, time):
+        if time <= self.start:
+            return self.keyframes[0].value.naked_value
+        return self.get_current(time)
+
+    def bake(self, fps, blend = True):
+        baked = copy.copy(self)
+        baked.baked = BakedSamples(self, fps, blend)
+        # Shadows the exact evaluation for this copy only
+        baked.get_current = baked.baked.get_current
+        return baked
 
     @staticmethod
     def read_curve(value_map : dict):
         curve = value_map.get('curve', 'linear')
         if curve == 'linear':
-            return LinearCurveData()
+            return LINEAR
         elif curve == 'stepped':
-            return SteppedCurveData()
+            return STEPPED
         return BezierCurveData.from_points(
             *(float(x) for x in curve)
         )
 
 class RotateTimeline(InterpolableTimeline):
+    ANGULAR = True
+
     def __init__(self, bone_index):
         super().__init__()
         self.bone_index = bone_index
@@ -183,7 +395,7 @@ class RotateTimeline(InterpolableTimeline):
         return InterpolableKeyframe.BoundedAngularScalar(keyframe["angle"])
 
     def apply(self, skeleton, time, alpha):
-        curr = self.get_current(time)
+        curr = self.get_current(time, skeleton.timeline_cursors)
 
         bone = skeleton.bones[self.bone_index]
 
@@ -192,6 +404,12 @@ class RotateTimeline(InterpolableTimeline):
         new_rotation = bone.rotation + amount * alpha
         bone.rotation = new_rotation
 
+    def mix_local(self, local, bone_data, time, alpha, cursors):
+        # Same blend as apply, on a [x, y, rotation, scale_x, scale_y] list
+        curr = self.get_current(time, cursors)
+        amount = mod_m180_p180(bone_data.rotation + curr - local[2])
+        local[2] = local[2] + amount * alpha
+
 class TranslateTimeline(InterpolableTimeline):
     def __init__(self, bone_index):
         super().__init__()
@@ -203,25 +421,35 @@ class TranslateTimeline(InterpolableTimeline):
         return InterpolableKeyframe.ScalarCouple((x, y))
 
     def apply(self, skeleton, time, alpha):
-        curr = self.get_current(time)
+        curr = self.get_current(time, skeleton.timeline_cursors)
 
         bone = skeleton.bones[self.bone_index]
 
         bone.x = bone.x + (bone.data.x + curr[0] - bone.x) * alpha
         bone.y = bone.y + (bone.data.y + curr[1] - bone.y) * alpha
 
+    def mix_local(self, local, bone_data, time, alpha, cursors):
+        curr = self.get_current(time, cursors)
+        local[0] = local[0] + (bone_data.x + curr[0] - local[0]) * alpha
+        local[1] = local[1] + (bone_data.y + curr[1] - local[1]) * alpha
+
 class ScaleTimeline(TranslateTimeline):
     def __init__(self, bone_index):
         super().__init__(bone_index)
 
     def apply(self, skeleton, time, alpha):
-        curr = self.get_current(time)
+        curr = self.get_current(time, skeleton.timeline_cursors)
 
         bone = skeleton.bones[self.bone_index]
 
         bone.scale_x = (bone.scale_x + (bone.data.scale_x - 1 + curr[0] - bone.scale_x) * alpha)
         bone.scale_y = (bone.scale_y + (bone.data.scale_y - 1 + curr[1] - bone.scale_y) * alpha)
 
+    def mix_local(self, local, bone_data, time, alpha, cursors):
+        curr = self.get_current(time, cursors)
+        local[3] = local[3] + (bone_data.scale_x - 1 + curr[0] - local[3]) * alpha
+        local[4] = local[4] + (bone_data.scale_y - 1 + curr[1] - local[4]) * alpha
+
 class ColorTimeline(InterpolableTimeline):
     def __init__(self, slot_index):
         super().__init__()
@@ -233,7 +461,7 @@ class ColorTimeline(InterpolableTimeline):
         return InterpolableKeyframe.ValueList(Color.parse(keyframe["color"])) 
 
     def apply(self, skeleton, time, alpha):
-        curr = self.get_current(time)
+        curr = self.get_current(time, skeleton.timeline_cursors)
 
         slot = skeleton.slots[self.slot_index]
         
@@ -257,6 +485,6 @@ class AttachmentTimeline(InterpolableTimeline):
     def read_data(keyframe):
         return InterpolableKeyframe.ValueList(keyframe["name"])
     def apply(self, skeleton, time, alpha):
-        curr = self.get_current(time)
+        curr = self.get_current(time, skeleton.timeline_cursors)
         if curr is None: return
         skeleton.slots[self.slot_index].set_attachment(skeleton.get_attachment_by_index(self.slot_index, curr))        
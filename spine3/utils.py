@@ -1,9 +1,5 @@
-from pathlib import Path
-
 from .containers import AnimationContainer, AutotimeAnimationContainer
-from . import atlas
-from . import skeletons
-from . import attachment_loader
+from . import registry
 class Color:
 	def __init__(self, r, g, b, a):
 		self.r = r
@@ -21,26 +17,18 @@ class Color:
 			a = int(hex_str[6:8], 16)
 		)
 
-def autoload(dir, name):
-	dir = Path(dir)
-	atlas_path = (dir / name).with_suffix('.atlas').resolve()
-	skeleton_path = (dir / name).with_suffix(".json").resolve()
-	if not atlas_path.exists():
-		raise FileNotFoundError(f"Atlas {atlas_path} not fount")
-	if not skeleton_path.exists():
-		raise FileNotFoundError(f"Skeleton {skeleton_path} not fount")
-
-	l_atlas = atlas.Atlas(file=atlas_path)
-	skeleton = skeletons.Skeleton.parse(
-        skeleton_path.open("r"),
-        attachment_loader.AttachmentLoader(l_atlas)
-    )
-	skeleton.set_to_bind_pose()
-
-	return skeleton
+def autoload(dir, name, rotation_steps = None, compiled = False):
+	# Rigs loaded before share their atlas and SkeletonData, only the returned
+	# skeleton is new. compiled uses (and refreshes) the .skel3 file next to
+	# the JSON
+	return registry.default_registry.skeleton(
+		dir, name,
+		rotation_steps = rotation_steps,
+		compiled = compiled
+	)
 
-def autoload_container(dir, name, autotime=False):
-	skeleton = autoload(dir, name)
+def autoload_container(dir, name, autotime=False, rotation_steps = None, compiled = False):
+	skeleton = autoload(dir, name, rotation_steps = rotation_steps, compiled = compiled)
 	if autotime:
 		return AutotimeAnimationContainer(skeleton)
 	return AnimationContainer(skeleton)
\ No newline at end of file